@@ -4,19 +4,19 @@ Punto de entrada simple que invoca el main.
 """
 
 import sys
-import argparse
 from pathlib import Path
 
+__version__ = "1.0.0"
+
 # Agregar src al path para imports
 src_path = Path(__file__).parent / "src"
 sys.path.insert(0, str(src_path))
 
-from src.main import main
-import asyncio
-
 
 def parse_arguments():
     """Parsea los argumentos de línea de comandos."""
+    import argparse
+
     parser = argparse.ArgumentParser(
         description='Sistema de Alertas de Email',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -24,39 +24,52 @@ def parse_arguments():
 Ejemplos de uso:
   python run.py                    # Iniciar normalmente
   python run.py --version          # Mostrar versión
-  
+
 Para detener el servicio: Ctrl+C
         """
     )
-    
+
     parser.add_argument(
         '--version',
         action='version',
-        version='Sistema de Alertas v1.0.0'
+        version=f'Sistema de Alertas v{__version__}'
     )
-    
+
     parser.add_argument(
         '--debug',
         action='store_true',
         help='Ejecutar en modo debug (más logs)'
     )
-    
+
     return parser.parse_args()
 
 
 if __name__ == "__main__":
+    # Atajo para --version: evita importar argparse, asyncio y todo el
+    # árbol de src.main solo para imprimir la versión
+    if len(sys.argv) == 2 and sys.argv[1] in ('--version', '-V'):
+        print(f'Sistema de Alertas v{__version__}')
+        sys.exit(0)
+
     args = parse_arguments()
-    
-    print("=" * 60)
-    print("Sistema de Alertas de Email v1.0.0")
-    print("=" * 60)
-    print()
-    
+
+    # Imports pesados recién después de resolver los argumentos
+    import asyncio
+    from src.main import main
+
+    # Banner solo en terminal interactiva (bajo systemd/Docker alcanza con
+    # el mensaje de arranque del logger) y en una única escritura
+    if sys.stdout.isatty():
+        separator = "=" * 60
+        sys.stdout.write(
+            f"{separator}\nSistema de Alertas de Email v{__version__}\n{separator}\n\n"
+        )
+
     if args.debug:
         print("Modo DEBUG activado")
         import logging
         logging.getLogger().setLevel(logging.DEBUG)
-    
+
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
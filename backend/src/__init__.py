@@ -1,16 +1,16 @@
 """
 Sistema de Alertas de Email
 Módulo principal del backend
+
+Los submódulos se cargan de forma diferida (PEP 562) para que importar
+el paquete no pague el costo de imaplib, websockets, aiohttp, etc.
+cuando solo se necesita la versión o la ayuda de línea de comandos.
 """
 
-from .config_loader import config, ConfigLoader
-from .email_monitor import EmailMonitor
-from .websocket_server import WebSocketServer
-from .storage_manager import storage, StorageManager
-from .schedule_manager import scheduler, ScheduleManager
+import importlib
 
 __version__ = "1.0.0"
-__all__ = [
+__all__ = (
     "config",
     "ConfigLoader",
     "EmailMonitor",
@@ -19,4 +19,32 @@ __all__ = [
     "StorageManager",
     "scheduler",
     "ScheduleManager",
-]
+)
+
+# Mapa de atributo -> (submódulo, nombre) para carga diferida
+_lazy_map = {
+    "config": (".config_loader", "config"),
+    "ConfigLoader": (".config_loader", "ConfigLoader"),
+    "EmailMonitor": (".email_monitor", "EmailMonitor"),
+    "WebSocketServer": (".websocket_server", "WebSocketServer"),
+    "storage": (".storage_manager", "storage"),
+    "StorageManager": (".storage_manager", "StorageManager"),
+    "scheduler": (".schedule_manager", "scheduler"),
+    "ScheduleManager": (".schedule_manager", "ScheduleManager"),
+}
+
+
+def __getattr__(name):
+    """Carga el submódulo correspondiente en el primer acceso al atributo."""
+    try:
+        module_name, attr_name = _lazy_map[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(module_name, __name__)
+    value = getattr(module, attr_name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
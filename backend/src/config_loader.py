@@ -9,39 +9,59 @@ from pathlib import Path
 from typing import Dict, Any, Optional
 from datetime import datetime
 
+# orjson (C) parsea y serializa varias veces más rápido que json;
+# si no está instalado se usa la librería estándar
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 class ConfigLoader:
     """Gestor de configuración singleton para la aplicación."""
-    
+
+    # Sin __dict__ por instancia: el acceso a los atributos aplanados
+    # se resuelve por slot, más rápido y con menos memoria
+    __slots__ = (
+        '_config', '_mtime_ns',
+        'master_username', 'master_password',
+        'email_server', 'email_port', 'email_address',
+        'email_password', 'email_ssl',
+        'websocket_host', 'websocket_port',
+        'log_level', 'log_max_size_mb', 'log_backup_count',
+        'monitor_check_interval', 'monitor_idle_timeout',
+    )
+
     _instance: Optional['ConfigLoader'] = None
     _config_path: Path = Path(__file__).parent.parent / "data" / "config.json"
-    
+
     def __new__(cls):
+        # Toda la inicialización ocurre aquí, una sola vez: hacerla en
+        # __init__ haría que cada ConfigLoader() releyera el JSON
         if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._initialized = False
+            instance = super().__new__(cls)
+            instance._config = {}
+            instance._load_config()
+            cls._instance = instance
         return cls._instance
-    
-    
-    def __init__(self):
-        if self._initialized:
-            return
-        self._config: Dict[str, Any] = {}
-        self._load_config()
-        self._initialized = True
 
-    
+
     def _load_config(self) -> None:
         """Carga la configuración desde el archivo JSON."""
         try:
             if not self._config_path.exists():
                 raise FileNotFoundError(f"Archivo de configuración no encontrado: {self._config_path}")
             
-            with open(self._config_path, 'r', encoding='utf-8') as f:
-                self._config = json.load(f)
-            
+            self._mtime_ns = self._config_path.stat().st_mtime_ns
+            raw = self._config_path.read_bytes()
+            if orjson is not None:
+                self._config = orjson.loads(raw)
+            else:
+                self._config = json.loads(raw)
+
             self._validate_config()
-            
+            self._flatten_config()
+
         except json.JSONDecodeError as e:
             raise ValueError(f"Error al parsear el archivo de configuración: {e}")
         except Exception as e:
@@ -59,91 +79,65 @@ class ConfigLoader:
     def save_config(self) -> None:
         """Guarda la configuración actual en el archivo JSON."""
         try:
+            # Re-aplanar por si el diccionario interno fue mutado directamente
+            self._flatten_config()
             self._config['last_updated'] = datetime.now().isoformat()
-            with open(self._config_path, 'w', encoding='utf-8') as f:
-                json.dump(self._config, f, indent=2, ensure_ascii=False)
+            if orjson is not None:
+                data = orjson.dumps(self._config, option=orjson.OPT_INDENT_2)
+            else:
+                data = json.dumps(
+                    self._config, indent=2, ensure_ascii=False
+                ).encode('utf-8')
+            # Escritura atómica: si el proceso muere a mitad de camino el
+            # config.json anterior queda intacto
+            tmp = self._config_path.with_suffix('.json.tmp')
+            tmp.write_bytes(data)
+            os.replace(tmp, self._config_path)
+            # El archivo en disco ya refleja el estado en memoria: registrar
+            # el mtime nuevo para que la próxima recarga no re-parsee
+            self._mtime_ns = self._config_path.stat().st_mtime_ns
         except Exception as e:
             raise RuntimeError(f"Error al guardar la configuración: {e}")
         
     
     def reload(self) -> None:
-        """Recarga la configuración desde el archivo."""
-        self._load_config()
-    
+        """Recarga la configuración desde el archivo si cambió en disco."""
+        self._maybe_reload()
 
-    # Propiedades de acceso a la configuración
-    @property
-    def master_username(self) -> str:
-        """Obtiene el usuario maestro."""
-        return self._config['master_credentials']['username']
-    
-    @property
-    def master_password(self) -> str:
-        """Obtiene la contraseña maestra."""
-        return self._config['master_credentials']['password']
-    
-    @property
-    def email_server(self) -> str:
-        """Obtiene el servidor IMAP."""
-        return self._config['email']['server']
-    
-    @property
-    def email_port(self) -> int:
-        """Obtiene el puerto IMAP."""
-        return self._config['email']['port']
-    
-    @property
-    def email_address(self) -> str:
-        """Obtiene la dirección de correo."""
-        return self._config['email']['address']
-    
-    @property
-    def email_password(self) -> str:
-        """Obtiene la contraseña del correo."""
-        return self._config['email']['password']
-    
-    @property
-    def email_ssl(self) -> bool:
-        """Indica si se usa SSL para IMAP."""
-        return self._config['email']['ssl']
-    
-    @property
-    def websocket_host(self) -> str:
-        """Obtiene el host del servidor WebSocket."""
-        return self._config['websocket']['host']
-    
-    @property
-    def websocket_port(self) -> int:
-        """Obtiene el puerto del servidor WebSocket."""
-        return self._config['websocket']['port']
-    
-    @property
-    def log_level(self) -> str:
-        """Obtiene el nivel de logging."""
-        return self._config['logging']['level']
-    
-    @property
-    def log_max_size_mb(self) -> int:
-        """Obtiene el tamaño máximo de archivos de log."""
-        return self._config['logging']['max_file_size_mb']
-    
-    @property
-    def log_backup_count(self) -> int:
-        """Obtiene el número de backups de logs."""
-        return self._config['logging']['backup_count']
-    
-    @property
-    def monitor_check_interval(self) -> int:
-        """Obtiene el intervalo de chequeo en segundos."""
-        return self._config['monitor']['check_interval']
-    
-    @property
-    def monitor_idle_timeout(self) -> int:
-        """Obtiene el timeout de idle en segundos."""
-        return self._config['monitor']['idle_timeout']
+    def _maybe_reload(self) -> None:
+        """Re-parsea el archivo solo si su mtime cambió desde la última carga."""
+        try:
+            current = self._config_path.stat().st_mtime_ns
+        except OSError:
+            current = -1
+        if current != self._mtime_ns:
+            self._load_config()
     
 
-    def update_email_config(self, server: str, port: int, address: str, 
+    def _flatten_config(self) -> None:
+        """
+        Aplana el diccionario de configuración en atributos planos.
+
+        El acceso repetido vía propiedades costaba dos lookups de dict por
+        lectura; con atributos planos cada acceso es una sola carga.
+        """
+        self.master_username: str = self._config['master_credentials']['username']
+        self.master_password: str = self._config['master_credentials']['password']
+        self.email_server: str = self._config['email']['server']
+        self.email_port: int = self._config['email']['port']
+        self.email_address: str = self._config['email']['address']
+        self.email_password: str = self._config['email']['password']
+        self.email_ssl: bool = self._config['email']['ssl']
+        self.websocket_host: str = self._config['websocket']['host']
+        self.websocket_port: int = self._config['websocket']['port']
+        self.log_level: str = self._config['logging']['level']
+        self.log_max_size_mb: int = self._config['logging']['max_file_size_mb']
+        self.log_backup_count: int = self._config['logging']['backup_count']
+        self.monitor_check_interval: int = self._config['monitor']['check_interval']
+        self.monitor_idle_timeout: int = self._config['monitor']['idle_timeout']
+
+
+    def update_email_config(self, server: str, port: int, address: str,
                            password: str, ssl: bool) -> None:
         """
         Actualiza la configuración de email y guarda los cambios.
@@ -155,6 +149,13 @@ class ConfigLoader:
             password: Contraseña del correo
             ssl: Usar SSL
         """
+        # Caso común "ya configurado": si nada cambió no hay nada que
+        # serializar ni escribir a disco
+        current = self._config['email']
+        if (current['server'] == server and current['port'] == port and
+                current['address'] == address and
+                current['password'] == password and current['ssl'] == ssl):
+            return
         self._config['email']['server'] = server
         self._config['email']['port'] = port
         self._config['email']['address'] = address
@@ -190,5 +191,11 @@ class ConfigLoader:
         return self._config.copy()
 
 
-# Instancia global singleton
-config = ConfigLoader()
+# Instancia global singleton, creada de forma diferida para no leer
+# config.json al importar el módulo (PEP 562)
+def __getattr__(name):
+    if name == "config":
+        instance = ConfigLoader()
+        globals()["config"] = instance
+        return instance
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -3,22 +3,54 @@ Monitor de correo electrónico IMAP.
 Detecta nuevos emails y notifica a través de callbacks.
 """
 
+import base64
+import codecs
 import imaplib
 import email as email_module
+import quopri
+import re
+from functools import lru_cache
 from email.header import decode_header
 from email.message import Message as EmailMessage
-from typing import Callable, Dict, Any, List, Optional, Set
-import threading
-import time
+from email.parser import BytesHeaderParser
+from typing import Callable, Deque, Dict, Any, List, Optional, Set
+from collections import deque
+import asyncio
+import inspect
 import logging
 from datetime import datetime
 
 from config_loader import config
 
+# Token RFC 2047: =?charset?codificación?payload?= — decodificarlo con un
+# regex precompilado evita el tokenizador puro-Python de decode_header
+# en cada header de cada email nuevo
+_RFC2047 = re.compile(r'=\?([^?]+)\?([BbQq])\?([^?]*)\?=')
+# Incluye CR/LF: los headers llegan todavía plegados (RFC 5322), así que
+# el hueco entre dos tokens codificados suele ser "\r\n " y también se ignora
+_WHITESPACE = re.compile(r'^[ \t\r\n]+$')
+
+# Parser de solo-headers: a diferencia de message_from_bytes no arma el
+# árbol MIME completo, O(headers) en lugar de O(mensaje)
+_hdr_parser = BytesHeaderParser()
+
+
+@lru_cache(maxsize=32)
+def _lookup_codec(charset: str) -> codecs.CodecInfo:
+    """Resuelve (y cachea) el codec de un charset, con utf-8 de respaldo."""
+    try:
+        return codecs.lookup(charset)
+    except LookupError:
+        return codecs.lookup('utf-8')
+
 
 class EmailMonitor:
     """Monitor de correo electrónico que detecta nuevos mensajes."""
-    
+
+    # Límite de UIDs recordados: sin tope el set crece sin cota en un
+    # monitor de larga vida (mismo límite que usa el storage)
+    _MAX_PROCESSED_UIDS = 10000
+
     def __init__(self, on_new_email_callback: Callable[[Dict[str, Any]], None]):
         """
         Inicializa el monitor de email.
@@ -30,36 +62,45 @@ class EmailMonitor:
         self.logger = logging.getLogger(__name__)
         
         self._running = False
-        self._thread: Optional[threading.Thread] = None
+        self._task: Optional[asyncio.Task] = None
         self._imap: Optional[imaplib.IMAP4_SSL] = None
         self._processed_uids: Set[str] = set()
+        self._uid_order: Deque[str] = deque()
         self._check_interval = config.monitor_check_interval
         self._idle_timeout = config.monitor_idle_timeout
+        self._idle_supported = False
     
     def start(self) -> None:
-        """Inicia el monitoreo de emails en un thread separado."""
+        """Inicia el monitoreo de emails como tarea asyncio."""
         if self._running:
             self.logger.warning("El monitor ya está en ejecución")
             return
-        
+
         if not config.is_email_configured():
             raise ValueError("La configuración de email no está completa")
-        
+
         self._running = True
-        self._thread = threading.Thread(target=self._monitor_loop, daemon=True)
-        self._thread.start()
+        self._task = asyncio.get_running_loop().create_task(self._monitor_loop())
         self.logger.info("Monitor de email iniciado")
-    
-    def stop(self) -> None:
+
+    async def stop(self) -> None:
         """Detiene el monitoreo de emails."""
         if not self._running:
             return
-        
+
         self._running = False
-        if self._thread:
-            self._thread.join(timeout=5)
-        
-        self._disconnect()
+
+        # Cerrar la conexión primero: desbloquea un IDLE o fetch en curso
+        await asyncio.to_thread(self._disconnect)
+
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
         self.logger.info("Monitor de email detenido")
     
     def _connect(self) -> bool:
@@ -77,8 +118,21 @@ class EmailMonitor:
             
             self._imap.login(config.email_address, config.email_password)
             self._imap.select('INBOX')
-            
+
+            # IDLE (RFC 2177) requiere soporte del servidor y de imaplib
+            # (disponible desde Python 3.13); si falta, se usa polling
+            self._idle_supported = (
+                hasattr(self._imap, 'idle') and
+                'IDLE' in self._imap.capabilities
+            )
+
             self.logger.info(f"Conectado a {config.email_server}:{config.email_port}")
+            if self._idle_supported:
+                self.logger.info("Servidor soporta IDLE: usando notificaciones push")
+            else:
+                self.logger.info(
+                    f"IDLE no disponible: polling cada {self._check_interval}s"
+                )
             return True
             
         except imaplib.IMAP4.error as e:
@@ -95,43 +149,67 @@ class EmailMonitor:
                 self._imap.close()
                 self._imap.logout()
             except Exception as e:
-                self.logger.debug(f"Error al desconectar IMAP: {e}")
+                self.logger.debug("Error al desconectar IMAP: %s", e)
             finally:
                 self._imap = None
     
-    def _monitor_loop(self) -> None:
-        """Loop principal de monitoreo."""
+    async def _monitor_loop(self) -> None:
+        """
+        Loop principal de monitoreo.
+
+        Corre como tarea asyncio; las llamadas bloqueantes de imaplib se
+        derivan a un thread del executor con asyncio.to_thread para no
+        frenar el event loop.
+        """
         while self._running:
             try:
                 # Conectar si no está conectado
                 if not self._imap:
-                    if not self._connect():
+                    if not await asyncio.to_thread(self._connect):
                         self.logger.error("No se pudo conectar. Reintentando en 30s...")
-                        time.sleep(30)
+                        await asyncio.sleep(30)
                         continue
-                
+
                 # Buscar nuevos emails
-                new_emails = self._fetch_new_emails()
-                
-                # Procesar cada nuevo email
+                new_emails = await asyncio.to_thread(self._fetch_new_emails)
+
+                # Procesar cada nuevo email (el callback puede ser corutina)
                 for email_data in new_emails:
                     try:
-                        self.on_new_email(email_data)
+                        result = self.on_new_email(email_data)
+                        if inspect.isawaitable(result):
+                            await result
                     except Exception as e:
                         self.logger.error(f"Error en callback de nuevo email: {e}")
-                
-                # Esperar antes del próximo chequeo
-                time.sleep(self._check_interval)
-                
+
+                # Esperar al próximo chequeo: push si hay IDLE, sino polling
+                if self._idle_supported:
+                    await asyncio.to_thread(self._idle_wait)
+                else:
+                    await asyncio.sleep(self._check_interval)
+
+            except asyncio.CancelledError:
+                raise
             except imaplib.IMAP4.abort as e:
                 self.logger.warning(f"Conexión IMAP interrumpida: {e}")
                 self._disconnect()
-                time.sleep(5)
+                await asyncio.sleep(5)
             except Exception as e:
                 self.logger.error(f"Error en loop de monitoreo: {e}")
                 self._disconnect()
-                time.sleep(10)
+                await asyncio.sleep(10)
     
+    def _idle_wait(self) -> None:
+        """
+        Espera en IDLE hasta que el servidor anuncie correo nuevo
+        o se cumpla el timeout configurado.
+        """
+        with self._imap.idle(duration=self._idle_timeout) as idler:
+            for typ, _data in idler:
+                # EXISTS indica que cambió el número de mensajes del buzón
+                if typ == 'EXISTS':
+                    break
+
     def _fetch_new_emails(self) -> List[Dict[str, Any]]:
         """
         Busca nuevos emails no procesados.
@@ -140,28 +218,33 @@ class EmailMonitor:
             Lista de emails nuevos parseados
         """
         try:
-            # Buscar todos los emails no leídos
-            status, messages = self._imap.search(None, 'UNSEEN')
-            
+            # Buscar todos los emails no leídos por UID: a diferencia de los
+            # números de secuencia, los UIDs son estables entre reconexiones
+            status, messages = self._imap.uid('search', None, 'UNSEEN')
+
             if status != 'OK':
                 self.logger.warning("No se pudieron buscar emails")
                 return []
-            
-            email_ids = messages[0].split()
+
+            email_uids = messages[0].split()
             new_emails = []
-            
-            for email_id in email_ids:
-                email_id_str = email_id.decode()
-                
+
+            # Un solo timestamp por lote: evita una llamada al reloj
+            # (y un string nuevo) por cada mensaje
+            now_iso = datetime.now().isoformat()
+
+            for email_uid in email_uids:
+                email_uid_str = email_uid.decode()
+
                 # Verificar si ya fue procesado
-                if email_id_str in self._processed_uids:
+                if email_uid_str in self._processed_uids:
                     continue
-                
+
                 # Obtener el email
-                email_data = self._fetch_email(email_id)
+                email_data = self._fetch_email(email_uid, now_iso)
                 if email_data:
                     new_emails.append(email_data)
-                    self._processed_uids.add(email_id_str)
+                    self._remember_uid(email_uid_str)
             
             if new_emails:
                 self.logger.info(f"Detectados {len(new_emails)} nuevo(s) email(s)")
@@ -172,52 +255,166 @@ class EmailMonitor:
             self.logger.error(f"Error al buscar emails: {e}")
             return []
     
-    def _fetch_email(self, email_id: bytes) -> Optional[Dict[str, Any]]:
+    # Fetch combinado: headers de triage + headers MIME de la parte 1 +
+    # primeros 5000 bytes de esa parte. Evita bajar el mensaje completo
+    # (adjuntos incluidos) solo para mostrar asunto/remitente/resumen.
+    _TRIAGE_FETCH = (
+        '(BODY.PEEK[HEADER.FIELDS (SUBJECT FROM TO DATE)] '
+        'BODY.PEEK[1.MIME] BODY.PEEK[1]<0.5000>)'
+    )
+
+    def _fetch_email(self, email_uid: bytes, now_iso: str) -> Optional[Dict[str, Any]]:
         """
-        Obtiene y parsea un email específico.
-        
+        Obtiene y parsea un email específico por UID.
+
         Args:
-            email_id: ID del email a obtener
-            
+            email_uid: UID del email a obtener
+            now_iso: Timestamp ISO compartido por el lote actual
+
         Returns:
             Diccionario con los datos del email o None si falla
         """
         try:
-            status, msg_data = self._imap.fetch(email_id, '(RFC822)')
-            
+            status, msg_data = self._imap.uid('fetch', email_uid, self._TRIAGE_FETCH)
+
             if status != 'OK':
                 return None
-            
-            # Parsear el email
-            email_body = msg_data[0][1]
-            email_message = email_module.message_from_bytes(email_body)
-            
+
+            sections = self._split_fetch_sections(msg_data)
+            header_bytes = sections.get('HEADER')
+
+            if header_bytes is None:
+                # Servidor sin soporte para fetch parcial: bajar el mensaje
+                # completo como antes
+                return self._fetch_email_full(email_uid, now_iso)
+
+            email_message = _hdr_parser.parsebytes(header_bytes)
+
             # Extraer datos principales
             subject = self._decode_header_value(email_message.get('Subject', 'Sin asunto'))
             from_addr = self._decode_header_value(email_message.get('From', 'Desconocido'))
             to_addr = self._decode_header_value(email_message.get('To', ''))
             date_str = email_message.get('Date', '')
-            
-            # Extraer cuerpo del mensaje
-            body = self._get_email_body(email_message)
-            
+
+            # Decodificar el cuerpo parcial según sus headers MIME
+            body = self._decode_body_part(
+                sections.get('BODY', b''),
+                sections.get('MIME', b'')
+            )
+
             email_data = {
-                'id': email_id.decode(),
+                'id': email_uid.decode(),
                 'subject': subject,
                 'from': from_addr,
                 'to': to_addr,
                 'date': date_str,
                 'body': body,
-                'timestamp': datetime.now().isoformat(),
+                'timestamp': now_iso,
                 'unread': True
             }
-            
-            self.logger.debug(f"Email parseado: {subject} de {from_addr}")
+
+            self.logger.debug("Email parseado: %s de %s", subject, from_addr)
             return email_data
-            
+
         except Exception as e:
-            self.logger.error(f"Error al obtener email {email_id}: {e}")
+            self.logger.error(f"Error al obtener email {email_uid}: {e}")
             return None
+
+    def _fetch_email_full(self, email_uid: bytes, now_iso: str) -> Optional[Dict[str, Any]]:
+        """
+        Camino de respaldo: baja el mensaje RFC822 completo y lo parsea.
+
+        Args:
+            email_uid: UID del email a obtener
+            now_iso: Timestamp ISO compartido por el lote actual
+
+        Returns:
+            Diccionario con los datos del email o None si falla
+        """
+        status, msg_data = self._imap.uid('fetch', email_uid, '(RFC822)')
+
+        if status != 'OK':
+            return None
+
+        email_body = msg_data[0][1]
+        email_message = email_module.message_from_bytes(email_body)
+
+        return {
+            'id': email_uid.decode(),
+            'subject': self._decode_header_value(email_message.get('Subject', 'Sin asunto')),
+            'from': self._decode_header_value(email_message.get('From', 'Desconocido')),
+            'to': self._decode_header_value(email_message.get('To', '')),
+            'date': email_message.get('Date', ''),
+            'body': self._get_email_body(email_message),
+            'timestamp': now_iso,
+            'unread': True
+        }
+
+    @staticmethod
+    def _split_fetch_sections(msg_data: List[Any]) -> Dict[str, bytes]:
+        """
+        Separa las secciones de una respuesta FETCH de imaplib.
+
+        imaplib entrega la respuesta como una lista de tuplas
+        (prefijo, literal); el prefijo identifica la sección pedida.
+
+        Args:
+            msg_data: Respuesta cruda de imaplib
+
+        Returns:
+            Diccionario con claves 'HEADER', 'MIME' y 'BODY'
+        """
+        sections: Dict[str, bytes] = {}
+        for item in msg_data:
+            if not isinstance(item, tuple) or len(item) < 2:
+                continue
+            prefix, literal = item[0], item[1]
+            if b'HEADER.FIELDS' in prefix:
+                sections['HEADER'] = literal
+            elif b'1.MIME' in prefix:
+                sections['MIME'] = literal
+            elif b'BODY[1]' in prefix:
+                sections['BODY'] = literal
+        return sections
+
+    def _decode_body_part(self, body_bytes: bytes, mime_bytes: bytes) -> str:
+        """
+        Decodifica una parte de cuerpo según sus headers MIME.
+
+        Args:
+            body_bytes: Bytes crudos de la parte (posiblemente truncados)
+            mime_bytes: Headers MIME de la parte
+
+        Returns:
+            Cuerpo del mensaje como string
+        """
+        if not body_bytes:
+            return ''
+
+        try:
+            mime_headers = _hdr_parser.parsebytes(mime_bytes)
+            charset = mime_headers.get_content_charset() or 'utf-8'
+            encoding = mime_headers.get('Content-Transfer-Encoding', '').lower().strip()
+
+            if encoding == 'base64':
+                # El fetch parcial puede cortar el padding: decodificar
+                # hasta el último bloque completo de 4 bytes
+                data = b''.join(body_bytes.split())
+                data = data[:len(data) - (len(data) % 4)]
+                body_bytes = base64.b64decode(data)
+            elif encoding == 'quoted-printable':
+                body_bytes = quopri.decodestring(body_bytes)
+
+            body = body_bytes.decode(charset, errors='ignore')
+
+            if len(body) > 5000:
+                body = body[:5000] + '...'
+
+            return body.strip()
+
+        except Exception as e:
+            self.logger.warning(f"Error al decodificar cuerpo parcial: {e}")
+            return body_bytes.decode('utf-8', errors='ignore').strip()
     
     def _decode_header_value(self, header_value: str) -> str:
         """
@@ -231,21 +428,57 @@ class EmailMonitor:
         """
         if not header_value:
             return ''
-        
+
         try:
-            decoded_parts = decode_header(header_value)
-            decoded_str = ''
-            
-            for part, encoding in decoded_parts:
-                if isinstance(part, bytes):
-                    decoded_str += part.decode(encoding or 'utf-8', errors='ignore')
-                else:
-                    decoded_str += part
-            
-            return decoded_str
-        except Exception as e:
-            self.logger.warning(f"Error al decodificar header: {e}")
-            return str(header_value)
+            # Camino rápido: sin tokens RFC 2047 no hay nada que decodificar
+            if '=?' not in header_value:
+                return header_value
+            return self._decode_rfc2047(header_value)
+        except Exception:
+            # Respaldo: el tokenizador completo de la librería estándar
+            try:
+                parts = [
+                    part.decode(encoding or 'utf-8', errors='ignore')
+                    if isinstance(part, bytes) else part
+                    for part, encoding in decode_header(header_value)
+                ]
+                return ''.join(parts)
+            except Exception as e:
+                self.logger.warning(f"Error al decodificar header: {e}")
+                return str(header_value)
+
+    @staticmethod
+    def _decode_rfc2047(header_value: str) -> str:
+        """
+        Decodifica tokens =?charset?enc?payload?= con el regex precompilado.
+
+        Args:
+            header_value: Valor del header con posibles tokens RFC 2047
+
+        Returns:
+            String decodificado
+        """
+        parts: List[str] = []
+        pos = 0
+        last_was_encoded = False
+
+        for match in _RFC2047.finditer(header_value):
+            gap = header_value[pos:match.start()]
+            # El espacio entre dos tokens codificados adyacentes se ignora
+            if gap and not (last_was_encoded and _WHITESPACE.match(gap)):
+                parts.append(gap)
+            last_was_encoded = True
+
+            charset, enc, payload = match.group(1), match.group(2), match.group(3)
+            if enc in ('B', 'b'):
+                raw = base64.b64decode(payload)
+            else:
+                raw = quopri.decodestring(payload.replace('_', ' '), header=False)
+            parts.append(_lookup_codec(charset).decode(raw, 'ignore')[0])
+            pos = match.end()
+
+        parts.append(header_value[pos:])
+        return ''.join(parts)
     
     def _get_email_body(self, email_message: EmailMessage) -> str:
         """
@@ -258,45 +491,83 @@ class EmailMonitor:
             Cuerpo del mensaje como string
         """
         body = ''
-        
+
         try:
-            if email_message.is_multipart():
-                for part in email_message.walk():
-                    content_type = part.get_content_type()
-                    content_disposition = str(part.get('Content-Disposition', ''))
-                    
-                    # Buscar parte de texto
-                    if content_type == 'text/plain' and 'attachment' not in content_disposition:
-                        payload = part.get_payload(decode=True)
-                        if payload:
-                            charset = part.get_content_charset() or 'utf-8'
-                            body = payload.decode(charset, errors='ignore')
-                            break
-            else:
-                payload = email_message.get_payload(decode=True)
+            part = self._find_text_part(email_message)
+            if part is None and not email_message.is_multipart():
+                # Mensaje de una sola parte que no es text/plain (p.ej.
+                # text/html): decodificar esa única parte igual que antes
+                part = email_message
+            if part is not None:
+                payload = part.get_payload(decode=True)
                 if payload:
-                    charset = email_message.get_content_charset() or 'utf-8'
+                    charset = part.get_content_charset() or 'utf-8'
                     body = payload.decode(charset, errors='ignore')
-            
+
             # Limitar tamaño del cuerpo
             if len(body) > 5000:
                 body = body[:5000] + '...'
-            
+
             return body.strip()
-            
+
         except Exception as e:
             self.logger.warning(f"Error al extraer cuerpo del email: {e}")
             return ''
+
+    @classmethod
+    def _find_text_part(cls, part: EmailMessage) -> Optional[EmailMessage]:
+        """
+        Busca en profundidad la primera parte text/plain que no sea adjunto.
+
+        A diferencia de walk(), corta la búsqueda en el primer acierto sin
+        materializar el resto del árbol MIME.
+
+        Args:
+            part: Parte (o mensaje completo) donde buscar
+
+        Returns:
+            La parte encontrada o None
+        """
+        if part.is_multipart():
+            for sub_part in part.get_payload():
+                found = cls._find_text_part(sub_part)
+                if found is not None:
+                    return found
+            return None
+
+        if (part.get_content_type() == 'text/plain' and
+                part.get_content_disposition() != 'attachment'):
+            return part
+        return None
     
+    def _remember_uid(self, uid: str) -> None:
+        """
+        Registra un UID como procesado, descartando el más antiguo
+        si se supera el límite.
+
+        Args:
+            uid: UID a registrar
+        """
+        self._processed_uids.add(uid)
+        self._uid_order.append(uid)
+        if len(self._uid_order) > self._MAX_PROCESSED_UIDS:
+            self._processed_uids.discard(self._uid_order.popleft())
+
     def set_processed_uids(self, uids: Set[str]) -> None:
         """
         Establece los UIDs ya procesados (útil para restaurar estado).
-        
+
         Args:
             uids: Set de UIDs procesados
         """
-        self._processed_uids = uids.copy()
-        self.logger.info(f"Cargados {len(uids)} UIDs procesados")
+        # Los UIDs IMAP son crecientes: ordenar numéricamente para que
+        # la eventual evicción descarte primero los más antiguos
+        ordered = sorted(uids, key=lambda u: int(u) if u.isdigit() else 0)
+        self._processed_uids = set()
+        self._uid_order = deque()
+        for uid in ordered[-self._MAX_PROCESSED_UIDS:]:
+            self._remember_uid(uid)
+        self.logger.info(f"Cargados {len(self._processed_uids)} UIDs procesados")
     
     def get_processed_uids(self) -> Set[str]:
         """Obtiene los UIDs procesados."""
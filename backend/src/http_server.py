@@ -4,10 +4,16 @@ Servidor HTTP simple para servir la interfaz web.
 
 import asyncio
 import logging
+import mimetypes
+from email.utils import formatdate
 from pathlib import Path
 from aiohttp import web
 from typing import Optional
 
+# Variantes precomprimidas, en orden de preferencia (generadas con
+# scripts/compress_static.sh)
+_PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+
 
 class HTTPServer:
     """Servidor HTTP para la interfaz web."""
@@ -27,30 +33,46 @@ class HTTPServer:
         self.runner: Optional[web.AppRunner] = None
         self.site: Optional[web.TCPSite] = None
         self.static_dir = Path(__file__).parent.parent / "static"
-        
+
+        # Cache de index.html leído una sola vez en start()
+        self._index_bytes: Optional[bytes] = None
+        self._index_etag: Optional[str] = None
+        self._index_last_modified: Optional[str] = None
+
         # Verificar que el directorio static existe
         if not self.static_dir.exists():
             self.logger.warning(f"Directorio static no encontrado en {self.static_dir}")
             self.static_dir.mkdir(parents=True, exist_ok=True)
             self.logger.info(f"Directorio static creado en {self.static_dir}")
+
+        # Raíz resuelta para validar que cada candidato precomprimido
+        # quede contenido en static (rechaza ../ y symlinks que escapen)
+        self._static_root = self.static_dir.resolve()
+
+        # Resolver rutas estáticas una sola vez: start() ya no necesita
+        # hacer stat() por subdirectorio
+        self._index_path = self.static_dir / "index.html"
+        self._static_routes = [
+            (f'/{name}', subdir)
+            for name in ('css', 'js')
+            if (subdir := self.static_dir / name).exists()
+        ]
     
     async def start(self) -> None:
         """Inicia el servidor HTTP."""
         try:
-            self.app = web.Application()
-            
+            self.app = web.Application(middlewares=[self._precompressed_middleware])
+
+            # Leer index.html una sola vez y preparar headers de cache
+            self._load_index()
+
             # Ruta raíz - servir index.html
             self.app.router.add_get('/', self._handle_index)
-            
-            # Rutas para archivos estáticos (solo si existen)
-            css_dir = self.static_dir / 'css'
-            if css_dir.exists():
-                self.app.router.add_static('/css', css_dir, name='css')
-            
-            js_dir = self.static_dir / 'js'
-            if js_dir.exists():
-                self.app.router.add_static('/js', js_dir, name='js')
-            
+
+            # Rutas para archivos estáticos (resueltas en __init__)
+            for prefix, subdir in self._static_routes:
+                self.app.router.add_static(prefix, subdir, name=prefix.lstrip('/'))
+
             # Iniciar servidor
             self.runner = web.AppRunner(self.app)
             await self.runner.setup()
@@ -78,19 +100,75 @@ class HTTPServer:
         except Exception as e:
             self.logger.error(f"Error al detener servidor HTTP: {e}")
     
+    @web.middleware
+    async def _precompressed_middleware(self, request: web.Request, handler) -> web.StreamResponse:
+        """
+        Sirve la variante .br/.gz de un archivo estático si existe y el
+        navegador la acepta, evitando comprimir en cada request.
+        """
+        rel_path = request.path.lstrip('/')
+        if request.method == 'GET' and rel_path.startswith(('css/', 'js/')):
+            accepted = request.headers.get('Accept-Encoding', '')
+            original = self.static_dir / rel_path
+            for encoding, suffix in _PRECOMPRESSED:
+                if encoding not in accepted:
+                    continue
+                candidate = original.with_name(original.name + suffix)
+                # Este middleware corre antes del ruteo, así que no hereda
+                # la normalización del handler estático: resolver y exigir
+                # que el archivo quede dentro de static
+                try:
+                    resolved = candidate.resolve()
+                except OSError:
+                    continue
+                if not resolved.is_relative_to(self._static_root):
+                    continue
+                if resolved.is_file():
+                    content_type = mimetypes.guess_type(original.name)[0]
+                    headers = {'Content-Encoding': encoding, 'Vary': 'Accept-Encoding'}
+                    if content_type:
+                        headers['Content-Type'] = content_type
+                    return web.FileResponse(resolved, headers=headers)
+
+        return await handler(request)
+
+    def _load_index(self) -> None:
+        """Lee index.html a memoria y calcula sus headers de cache."""
+        index_file = self._index_path
+
+        if not index_file.exists():
+            self.logger.warning(f"index.html no encontrado en {self.static_dir}")
+            return
+
+        stat = index_file.stat()
+        self._index_bytes = index_file.read_bytes()
+        self._index_etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        self._index_last_modified = formatdate(stat.st_mtime, usegmt=True)
+
     async def _handle_index(self, request: web.Request) -> web.Response:
         """Maneja la solicitud de la página principal."""
         try:
-            index_file = self.static_dir / "index.html"
-            
-            if not index_file.exists():
-                return web.Response(text="index.html no encontrado", status=404)
-            
-            with open(index_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            return web.Response(text=content, content_type='text/html')
-            
+            if self._index_bytes is None:
+                # Reintentar la carga fuera del event loop por si el archivo
+                # apareció después del arranque
+                await asyncio.to_thread(self._load_index)
+                if self._index_bytes is None:
+                    return web.Response(text="index.html no encontrado", status=404)
+
+            # Respuesta 304 si el navegador ya tiene la versión cacheada
+            if request.headers.get('If-None-Match') == self._index_etag:
+                return web.Response(status=304)
+
+            return web.Response(
+                body=self._index_bytes,
+                content_type='text/html',
+                charset='utf-8',
+                headers={
+                    'ETag': self._index_etag,
+                    'Last-Modified': self._index_last_modified,
+                }
+            )
+
         except Exception as e:
             self.logger.error(f"Error sirviendo index.html: {e}")
             return web.Response(text="Error interno del servidor", status=500)
@@ -5,18 +5,55 @@ Orquesta todos los componentes del sistema de alertas.
 
 import asyncio
 import logging
+import os
 import signal
 import sys
 from pathlib import Path
-from logging.handlers import RotatingFileHandler
-from typing import Optional
+from logging.handlers import MemoryHandler, RotatingFileHandler
+from typing import Optional, TYPE_CHECKING
 
 from config_loader import config
-from email_monitor import EmailMonitor
-from websocket_server import WebSocketServer
 from storage_manager import storage
 from schedule_manager import scheduler
-from http_server import HTTPServer
+
+# Los componentes pesados (aiohttp, websockets, imaplib) se importan recién
+# dentro de startup(); acá solo para anotaciones de tipo
+if TYPE_CHECKING:
+    from email_monitor import EmailMonitor
+    from http_server import HTTPServer
+    from test_imap_server import TestIMAPServer
+    from websocket_server import WebSocketServer
+
+
+class FastRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler que evita los stat() por registro.
+
+    La implementación estándar consulta os.path.exists/isfile en cada
+    shouldRollover; acá ese chequeo se cachea al abrir el archivo y solo
+    se compara el tamaño del stream contra maxBytes en cada emit.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._is_file: Optional[bool] = None
+
+    def _open(self):
+        # Al (re)abrir el archivo se invalida el cache del chequeo
+        self._is_file = None
+        return super()._open()
+
+    def shouldRollover(self, record) -> bool:
+        if self.maxBytes <= 0:
+            return False
+        if self.stream is None:
+            self.stream = self._open()
+        if self._is_file is None:
+            self._is_file = os.path.isfile(self.baseFilename)
+        if not self._is_file:
+            return False
+        msg = f"{self.format(record)}\n"
+        self.stream.seek(0, 2)
+        return self.stream.tell() + len(msg) >= self.maxBytes
 
 
 class AlertApplication:
@@ -25,9 +62,11 @@ class AlertApplication:
     def __init__(self):
         """Inicializa la aplicación."""
         self.logger: Optional[logging.Logger] = None
-        self.http_server: Optional[HTTPServer] = None
-        self.websocket_server: Optional[WebSocketServer] = None
-        self.email_monitor: Optional[EmailMonitor] = None
+        self.http_server: Optional['HTTPServer'] = None
+        self.websocket_server: Optional['WebSocketServer'] = None
+        self.email_monitor: Optional['EmailMonitor'] = None
+        self.test_imap_server: Optional['TestIMAPServer'] = None
+        self._flush_task: Optional[asyncio.Task] = None
         self._shutdown_event = asyncio.Event()
         
         # Configurar logging
@@ -39,6 +78,14 @@ class AlertApplication:
     
     def _setup_logging(self) -> None:
         """Configura el sistema de logging."""
+        # Apagar la introspección por registro (getpid, current_thread y
+        # caminata de stack para %(pathname)s): el formato de abajo no
+        # usa %(process)d, %(thread)d ni ubicación de archivo
+        logging.logProcesses = False
+        logging.logThreads = False
+        logging.logMultiprocessing = False
+        logging._srcfile = None
+
         # Crear directorio de logs
         log_dir = Path(__file__).parent.parent / "data" / "logs"
         log_dir.mkdir(parents=True, exist_ok=True)
@@ -55,8 +102,10 @@ class AlertApplication:
         root_logger = logging.getLogger()
         root_logger.setLevel(getattr(logging, config.log_level))
         
-        # Handler para app.log (todos los niveles)
-        app_handler = RotatingFileHandler(
+        # Handler para app.log (todos los niveles), detrás de un buffer en
+        # memoria: los registros se vuelcan a disco de a 256 o ante el
+        # primer ERROR, en vez de una escritura por línea de log
+        app_handler = FastRotatingFileHandler(
             app_log,
             maxBytes=config.log_max_size_mb * 1024 * 1024,
             backupCount=config.log_backup_count,
@@ -64,64 +113,102 @@ class AlertApplication:
         )
         app_handler.setLevel(logging.DEBUG)
         app_handler.setFormatter(formatter)
-        
-        # Handler para errors.log (solo errores)
-        error_handler = RotatingFileHandler(
+        buffered_handler = MemoryHandler(
+            capacity=256,
+            flushLevel=logging.ERROR,
+            target=app_handler
+        )
+        buffered_handler.setLevel(logging.DEBUG)
+
+        # Handler para errors.log (solo errores); delay=True evita abrir el
+        # archivo hasta que realmente haya un error que registrar
+        error_handler = FastRotatingFileHandler(
             error_log,
             maxBytes=config.log_max_size_mb * 1024 * 1024,
             backupCount=config.log_backup_count,
-            encoding='utf-8'
+            encoding='utf-8',
+            delay=True
         )
         error_handler.setLevel(logging.ERROR)
         error_handler.setFormatter(formatter)
-        
+
         # Handler para consola
         console_handler = logging.StreamHandler(sys.stdout)
         console_handler.setLevel(logging.INFO)
         console_handler.setFormatter(formatter)
-        
+
         # Agregar handlers
-        root_logger.addHandler(app_handler)
+        root_logger.addHandler(buffered_handler)
         root_logger.addHandler(error_handler)
         root_logger.addHandler(console_handler)
         
         self.logger = logging.getLogger(__name__)
         self.logger.info(f"Logging configurado: nivel={config.log_level}")
     
-    def _on_new_email(self, email_data: dict) -> None:
+    async def _on_new_email(self, email_data: dict) -> None:
         """
         Callback llamado cuando llega un nuevo email.
-        
+
+        Corre dentro del event loop; las escrituras a disco se derivan a
+        un thread para no frenar los demás clientes.
+
         Args:
             email_data: Datos del email
         """
         try:
-            # Guardar el email
-            storage.save_email(email_data)
-            
-            # Guardar UID procesado
-            storage.save_processed_uid(email_data.get('id'))
-            
+            # Guardar email y UID procesado en una sola operación
+            await asyncio.to_thread(storage.record_new_email, email_data)
+
             # Transmitir por WebSocket
             self.websocket_server.broadcast_new_email(email_data)
             
             self.logger.info(
-                f"🔔 Nuevo email: '{email_data.get('subject', 'Sin asunto')}' "
-                f"de {email_data.get('from', 'Desconocido')}"
+                "🔔 Nuevo email: '%s' de %s",
+                email_data.get('subject', 'Sin asunto'),
+                email_data.get('from', 'Desconocido')
             )
             
         except Exception as e:
             self.logger.error(f"Error procesando nuevo email: {e}", exc_info=True)
     
     def _setup_signal_handlers(self) -> None:
-        """Configura los manejadores de señales para shutdown limpio."""
-        def signal_handler(signum, frame):
+        """Configura los manejadores de señales para shutdown limpio.
+
+        Usa loop.add_signal_handler: el callback corre dentro del event
+        loop (no en contexto de señal), por lo que crear la tarea de
+        shutdown es seguro.
+        """
+        loop = asyncio.get_running_loop()
+
+        def _request_shutdown(signum: int) -> None:
             self.logger.info(f"Señal recibida: {signum}")
             asyncio.create_task(self.shutdown())
-        
-        signal.signal(signal.SIGINT, signal_handler)
-        signal.signal(signal.SIGTERM, signal_handler)
+
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, _request_shutdown, sig)
+            except NotImplementedError:
+                # add_signal_handler no existe fuera de Unix
+                signal.signal(sig, lambda s, f: _request_shutdown(s))
     
+    async def _start_http(self) -> None:
+        """Levanta el servidor HTTP."""
+        self.logger.info("Inicializando servidor HTTP...")
+        from http_server import HTTPServer
+        self.http_server = HTTPServer(host='0.0.0.0', port=8080)
+        await self.http_server.start()
+
+    async def _init_email_monitor(self) -> None:
+        """Crea el monitor de email y restaura los UIDs procesados."""
+        self.logger.info("Inicializando monitor de email...")
+        from email_monitor import EmailMonitor
+        self.email_monitor = EmailMonitor(on_new_email_callback=self._on_new_email)
+
+        # Restaurar UIDs procesados desde storage (lectura en thread)
+        processed_uids = await asyncio.to_thread(storage.get_processed_uids)
+        self.email_monitor.set_processed_uids(processed_uids)
+        self.logger.info(f"Restaurados {len(processed_uids)} UIDs procesados")
+
     async def startup(self) -> None:
         """Inicia todos los componentes de la aplicación."""
         try:
@@ -134,29 +221,35 @@ class AlertApplication:
                     "Configure desde la interfaz web."
                 )
             
+            # Volcado periódico de los buffers de almacenamiento
+            self._flush_task = asyncio.create_task(storage.flush_loop())
+
+            # Servidor IMAP de prueba para desarrollo local
+            if config.email_server in ('localhost', '127.0.0.1'):
+                from test_imap_server import TestIMAPServer
+                self.test_imap_server = TestIMAPServer(
+                    host=config.email_server,
+                    port=config.email_port
+                )
+                self.test_imap_server.start()
+
             # Inicializar gestor de actividades
             self.logger.info("Gestor de actividades disponible")
             activities = scheduler.get_all_activities()
             self.logger.info(f"Actividades registradas: {len(activities)}")
             
-            # Inicializar servidor HTTP
-            self.logger.info("Inicializando servidor HTTP...")
-            self.http_server = HTTPServer(host='0.0.0.0', port=8080)
-            await self.http_server.start()
-            
             # Inicializar servidor WebSocket
             self.logger.info("Inicializando servidor WebSocket...")
+            from websocket_server import WebSocketServer
             self.websocket_server = WebSocketServer()
-            
-            # Inicializar monitor de email
-            self.logger.info("Inicializando monitor de email...")
-            self.email_monitor = EmailMonitor(on_new_email_callback=self._on_new_email)
-            
-            # Restaurar UIDs procesados desde storage
-            processed_uids = storage.get_processed_uids()
-            self.email_monitor.set_processed_uids(processed_uids)
-            self.logger.info(f"Restaurados {len(processed_uids)} UIDs procesados")
-            
+
+            # HTTP (bind de red) y monitor de email (lectura de disco) no
+            # dependen entre sí: se inician en paralelo
+            await asyncio.gather(
+                self._start_http(),
+                self._init_email_monitor(),
+            )
+
             # Iniciar monitor de email si está configurado
             if config.is_email_configured():
                 self.email_monitor.start()
@@ -186,15 +279,20 @@ class AlertApplication:
             # Detener monitor de email
             if self.email_monitor:
                 self.logger.info("Deteniendo monitor de email...")
-                self.email_monitor.stop()
+                await self.email_monitor.stop()
             
-            # Guardar UIDs procesados
+            # Guardar UIDs procesados en una sola escritura
             if self.email_monitor:
                 processed_uids = self.email_monitor.get_processed_uids()
-                for uid in processed_uids:
-                    storage.save_processed_uid(uid)
+                storage.save_processed_uids(processed_uids)
                 self.logger.info(f"Guardados {len(processed_uids)} UIDs procesados")
             
+            # Detener el volcado periódico y persistir lo pendiente
+            if self._flush_task:
+                self._flush_task.cancel()
+                self._flush_task = None
+            storage.flush()
+
             # Detener servidor WebSocket
             if self.websocket_server:
                 self.logger.info("Deteniendo servidor WebSocket...")
@@ -204,6 +302,10 @@ class AlertApplication:
             if self.http_server:
                 self.logger.info("Deteniendo servidor HTTP...")
                 await self.http_server.stop()
+
+            # Detener servidor IMAP de prueba
+            if self.test_imap_server:
+                self.test_imap_server.stop()
             
             self.logger.info("✓ Shutdown completado correctamente")
             
@@ -3,41 +3,263 @@ Gestor de persistencia de datos.
 Maneja el almacenamiento de emails y UIDs procesados.
 """
 
+import asyncio
 import json
 import logging
+import os
+from collections import deque
 from pathlib import Path
-from typing import Dict, Any, List, Set, Optional
+from typing import Dict, Any, FrozenSet, List, Set, Optional
 from datetime import datetime
 
+# orjson (C) serializa y parsea varias veces más rápido que json;
+# si no está instalado se usa la librería estándar
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    def _dumps_line(obj: Any) -> bytes:
+        """Serializa un objeto como línea JSONL (bytes con newline)."""
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+
+    _loads = orjson.loads
+else:
+    def _dumps_line(obj: Any) -> bytes:
+        """Serializa un objeto como línea JSONL (bytes con newline)."""
+        return (json.dumps(obj, ensure_ascii=False) + '\n').encode('utf-8')
+
+    _loads = json.loads
+
 
 class StorageManager:
     """Gestor de almacenamiento de datos en JSON."""
-    
+
+    # Límites de retención (idénticos a los del formato JSON anterior)
+    MAX_EMAILS = 1000
+    MAX_UIDS = 10000
+
+    # Cada cuántos appends se compactan los archivos JSONL
+    _COMPACT_EVERY = 200
+
     def __init__(self):
         """Inicializa el gestor de almacenamiento."""
         self.logger = logging.getLogger(__name__)
         self.data_dir = Path(__file__).parent.parent / "data"
         self.emails_file = self.data_dir / "emails.json"
+        self.emails_jsonl = self.data_dir / "emails.jsonl"
+        self.uids_file = self.data_dir / "uids.jsonl"
         self.schedule_file = self.data_dir / "schedule.json"
-        
+
+        self._appends_since_compact = 0
+
+        # Cache de JSON parseado por archivo, clave mtime_ns: los hits
+        # evitan releer y re-parsear si el archivo no cambió en disco
+        self._json_cache: Dict[Path, tuple] = {}
+
+        # Buffers de escrituras pendientes: los appends se acumulan en
+        # memoria y se vuelcan juntos en flush() (periódico o al apagar)
+        self._pending_emails: List[Dict[str, Any]] = []
+        self._pending_uids: List[str] = []
+
         # Asegurar que el directorio existe
         self.data_dir.mkdir(parents=True, exist_ok=True)
-        
+
         # Inicializar archivos si no existen
         self._init_files()
-    
+
+        # Cache en memoria de emails: deque con tope + índice id→dict
+        # para ubicar un email puntual en O(1) (p. ej. marcar leído)
+        self._emails: deque = self._read_email_lines()
+        self._emails_by_id: Dict[str, Dict[str, Any]] = {
+            e.get('id'): e for e in self._emails
+        }
+
+        # Cache en memoria de UIDs procesados: membresía O(1) sin releer
+        # ni re-parsear el archivo por cada email entrante
+        self._uid_set: Set[str] = set()
+        self._uid_order: deque = deque()
+        self._uid_frozen: Optional[FrozenSet[str]] = None
+        for uid in self._read_uid_lines():
+            self._remember_uid(uid)
+
+        # Actividades en memoria con índice id→posición: las mutaciones
+        # son O(1) en vez de recorrer la lista completa por cada llamada
+        self._activities: List[Dict[str, Any]] = (
+            self._read_json(self.schedule_file).get('activities', [])
+        )
+        self._activity_index: Dict[str, int] = {
+            a.get('id'): i for i, a in enumerate(self._activities)
+        }
+
+    def _read_email_lines(self) -> deque:
+        """
+        Lee emails.jsonl en un deque acotado a MAX_EMAILS.
+
+        El archivo es append-only: una actualización (p. ej. marcar
+        leído) se re-apendea como línea nueva, por eso al cargar se
+        deduplica por id quedándose con la última versión.
+        """
+        try:
+            by_id: Dict[str, Dict[str, Any]] = {}
+            with open(self.emails_jsonl, 'rb') as f:
+                for line in f:
+                    if line.strip():
+                        record = _loads(line)
+                        by_id[record.get('id')] = record
+            return deque(by_id.values(), maxlen=self.MAX_EMAILS)
+        except FileNotFoundError:
+            return deque(maxlen=self.MAX_EMAILS)
+        except Exception as e:
+            self.logger.error(f"Error al leer emails: {e}")
+            return deque(maxlen=self.MAX_EMAILS)
+
+    def _read_uid_lines(self) -> List[str]:
+        """Lee las líneas de uids.jsonl en orden, sin duplicados."""
+        try:
+            with open(self.uids_file, 'r', encoding='utf-8') as f:
+                return list(dict.fromkeys(
+                    line.strip() for line in f if line.strip()
+                ))
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            self.logger.error(f"Error al leer UIDs procesados: {e}")
+            return []
+
+    def _remember_email(self, email_data: Dict[str, Any]) -> None:
+        """Registra un email en el deque y el índice, en lockstep."""
+        if len(self._emails) == self.MAX_EMAILS:
+            evicted = self._emails[0]
+            self._emails_by_id.pop(evicted.get('id'), None)
+        self._emails.append(email_data)
+        self._emails_by_id[email_data.get('id')] = email_data
+
+    def _remember_uid(self, uid: str) -> None:
+        """Registra un UID en memoria, descartando el más antiguo al tope."""
+        self._uid_set.add(uid)
+        self._uid_order.append(uid)
+        if len(self._uid_order) > self.MAX_UIDS:
+            self._uid_set.discard(self._uid_order.popleft())
+        self._uid_frozen = None
+
     def _init_files(self) -> None:
         """Inicializa archivos de datos si no existen."""
-        if not self.emails_file.exists():
-            self._write_json(self.emails_file, {
-                "processed_uids": [],
-                "emails": []
-            })
-        
+        # Migrar el formato JSON monolítico anterior a JSONL append-only
+        if self.emails_file.exists() and not self.emails_jsonl.exists():
+            self._migrate_from_json()
+
+        if not self.emails_jsonl.exists():
+            self.emails_jsonl.touch()
+        if not self.uids_file.exists():
+            self.uids_file.touch()
+
         if not self.schedule_file.exists():
             self._write_json(self.schedule_file, {
                 "activities": []
             })
+
+        # Compactar al arrancar por si la corrida anterior superó los topes
+        self._compact()
+
+    def _migrate_from_json(self) -> None:
+        """Convierte el emails.json heredado al formato JSONL."""
+        data = self._read_json(self.emails_file)
+        emails = data.get('emails', [])
+        uids = data.get('processed_uids', [])
+
+        with open(self.emails_jsonl, 'wb') as f:
+            for email_data in emails[-self.MAX_EMAILS:]:
+                f.write(_dumps_line(email_data))
+
+        with open(self.uids_file, 'w', encoding='utf-8') as f:
+            for uid in uids[-self.MAX_UIDS:]:
+                f.write(str(uid) + '\n')
+
+        self.logger.info(
+            f"Migrados {len(emails)} emails y {len(uids)} UIDs a formato JSONL"
+        )
+
+    def _compact(self) -> None:
+        """
+        Reescribe los archivos JSONL conservando solo las últimas
+        MAX_EMAILS / MAX_UIDS entradas.
+
+        El append por email es O(1); esta compactación periódica es la
+        que aplica los topes de retención.
+        """
+        try:
+            # Deduplicar por id (los deltas de mark_read re-apendean la
+            # misma entrada) y recortar al tope de retención
+            with open(self.emails_jsonl, 'rb') as f:
+                n_lines = 0
+                by_id: Dict[str, bytes] = {}
+                for line in f:
+                    if line.strip():
+                        n_lines += 1
+                        by_id[_loads(line).get('id')] = line
+            kept = list(by_id.values())[-self.MAX_EMAILS:]
+            if len(kept) < n_lines:
+                with open(self.emails_jsonl, 'wb') as f:
+                    f.writelines(kept)
+
+            uid_lines = self._read_uid_lines()
+            if len(uid_lines) > self.MAX_UIDS:
+                with open(self.uids_file, 'w', encoding='utf-8') as f:
+                    f.write('\n'.join(uid_lines[-self.MAX_UIDS:]) + '\n')
+
+            self._appends_since_compact = 0
+
+        except Exception as e:
+            self.logger.error(f"Error al compactar almacenamiento: {e}")
+
+    def _note_append(self) -> None:
+        """Registra un append y compacta cada _COMPACT_EVERY escrituras."""
+        self._appends_since_compact += 1
+        if self._appends_since_compact >= self._COMPACT_EVERY:
+            self._compact()
+
+    # Volcado de buffers
+
+    def flush(self) -> None:
+        """
+        Vuelca los buffers pendientes a disco en una escritura por archivo.
+
+        Se invoca periódicamente desde flush_loop() y siempre durante el
+        shutdown de la aplicación.
+        """
+        if self._pending_emails:
+            pending, self._pending_emails = self._pending_emails, []
+            try:
+                with open(self.emails_jsonl, 'ab') as f:
+                    for email_data in pending:
+                        f.write(_dumps_line(email_data))
+                self._note_append()
+            except Exception as e:
+                self.logger.error(f"Error al volcar emails pendientes: {e}")
+                self._pending_emails = pending + self._pending_emails
+
+        if self._pending_uids:
+            pending_uids, self._pending_uids = self._pending_uids, []
+            try:
+                with open(self.uids_file, 'a', encoding='utf-8') as f:
+                    f.write('\n'.join(pending_uids) + '\n')
+                self._note_append()
+            except Exception as e:
+                self.logger.error(f"Error al volcar UIDs pendientes: {e}")
+                self._pending_uids = pending_uids + self._pending_uids
+
+    async def flush_loop(self, interval: float = 30.0) -> None:
+        """
+        Tarea asyncio que vuelca los buffers cada `interval` segundos.
+
+        Args:
+            interval: Segundos entre volcados
+        """
+        while True:
+            await asyncio.sleep(interval)
+            await asyncio.to_thread(self.flush)
     
     def _read_json(self, file_path: Path) -> Dict[str, Any]:
         """
@@ -50,9 +272,18 @@ class StorageManager:
             Contenido del archivo como diccionario
         """
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except json.JSONDecodeError as e:
+            mtime_ns = file_path.stat().st_mtime_ns
+            cached = self._json_cache.get(file_path)
+            if cached is not None and cached[0] == mtime_ns:
+                return cached[1]
+
+            # Modo binario: _loads acepta bytes y se evita la capa
+            # TextIOWrapper (decodificación + traducción de newlines)
+            with open(file_path, 'rb') as f:
+                data = _loads(f.read())
+            self._json_cache[file_path] = (mtime_ns, data)
+            return data
+        except ValueError as e:
             self.logger.error(f"Error al parsear {file_path.name}: {e}")
             return {}
         except Exception as e:
@@ -71,8 +302,19 @@ class StorageManager:
             True si fue exitoso
         """
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            # Escritura atómica: volcar a un .tmp y renombrar encima, así
+            # un corte a mitad de escritura nunca deja un JSON truncado
+            tmp = file_path.with_suffix(file_path.suffix + '.tmp')
+            # schedule.json se edita a mano: se conserva la indentación
+            if orjson is not None:
+                tmp.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+            else:
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, indent=2, ensure_ascii=False)
+            os.replace(tmp, file_path)
+            # Poblar el cache con lo recién escrito: la próxima lectura
+            # no necesita re-parsear
+            self._json_cache[file_path] = (file_path.stat().st_mtime_ns, data)
             return True
         except Exception as e:
             self.logger.error(f"Error al escribir {file_path.name}: {e}")
@@ -91,38 +333,61 @@ class StorageManager:
             True si fue exitoso
         """
         try:
-            data = self._read_json(self.emails_file)
-            
             # Agregar timestamp si no existe
             if 'saved_at' not in email_data:
                 email_data['saved_at'] = datetime.now().isoformat()
-            
-            # Agregar el email
-            data['emails'].append(email_data)
-            
-            # Limitar a los últimos 1000 emails
-            if len(data['emails']) > 1000:
-                data['emails'] = data['emails'][-1000:]
-            
-            success = self._write_json(self.emails_file, data)
-            if success:
-                self.logger.debug(f"Email guardado: {email_data.get('subject', 'Sin asunto')}")
-            
-            return success
-            
+
+            # Acumular en memoria; flush() lo persiste en lote
+            self._remember_email(email_data)
+            self._pending_emails.append(email_data)
+
+            self.logger.debug("Email guardado: %s", email_data.get('subject', 'Sin asunto'))
+            return True
+
         except Exception as e:
             self.logger.error(f"Error al guardar email: {e}")
             return False
-    
+
+    def record_new_email(self, email_data: Dict[str, Any]) -> bool:
+        """
+        Registra un email entrante y su UID en una sola operación.
+
+        Equivale a save_email + save_processed_uid pero comparte el
+        mismo paso de buffering, evitando dos pasadas por email.
+
+        Args:
+            email_data: Datos del email (su 'id' es el UID procesado)
+
+        Returns:
+            True si fue exitoso
+        """
+        try:
+            if 'saved_at' not in email_data:
+                email_data['saved_at'] = datetime.now().isoformat()
+
+            self._remember_email(email_data)
+            self._pending_emails.append(email_data)
+
+            uid = str(email_data.get('id'))
+            if uid not in self._uid_set:
+                self._remember_uid(uid)
+                self._pending_uids.append(uid)
+
+            self.logger.debug("Email guardado: %s", email_data.get('subject', 'Sin asunto'))
+            return True
+
+        except Exception as e:
+            self.logger.error(f"Error al registrar nuevo email: {e}")
+            return False
+
     def get_all_emails(self) -> List[Dict[str, Any]]:
         """
         Obtiene todos los emails guardados.
-        
+
         Returns:
             Lista de emails
         """
-        data = self._read_json(self.emails_file)
-        return data.get('emails', [])
+        return list(self._emails)
     
     def get_recent_emails(self, limit: int = 50) -> List[Dict[str, Any]]:
         """
@@ -140,173 +405,234 @@ class StorageManager:
     def clear_emails(self) -> bool:
         """
         Elimina todos los emails guardados.
-        
+
         Returns:
             True si fue exitoso
         """
-        data = self._read_json(self.emails_file)
-        data['emails'] = []
-        return self._write_json(self.emails_file, data)
-    
+        try:
+            self._emails.clear()
+            self._emails_by_id.clear()
+            self._pending_emails.clear()
+            self.emails_jsonl.write_text('', encoding='utf-8')
+            return True
+        except Exception as e:
+            self.logger.error(f"Error al limpiar emails: {e}")
+            return False
+
+    def mark_email_read(self, email_id: str) -> bool:
+        """
+        Marca un email como leído.
+
+        Args:
+            email_id: ID del email a marcar
+
+        Returns:
+            True si el email existía y fue actualizado
+        """
+        try:
+            # Lookup O(1) por índice; el delta se apendea como una línea
+            # nueva (última aparición gana al recargar/compactar) en vez
+            # de reescribir el archivo completo por cada click
+            email_data = self._emails_by_id.get(email_id)
+            if email_data is None:
+                return False
+
+            email_data['unread'] = False
+            self._pending_emails.append(email_data)
+            return True
+
+        except Exception as e:
+            self.logger.error(f"Error al marcar email como leído: {e}")
+            return False
+
     # Gestión de UIDs procesados
-    
+
     def save_processed_uid(self, uid: str) -> bool:
         """
         Guarda un UID como procesado.
-        
+
         Args:
             uid: UID del email procesado
-            
+
         Returns:
             True si fue exitoso
         """
         try:
-            data = self._read_json(self.emails_file)
-            
-            if uid not in data['processed_uids']:
-                data['processed_uids'].append(uid)
-                
-                # Limitar a los últimos 10000 UIDs
-                if len(data['processed_uids']) > 10000:
-                    data['processed_uids'] = data['processed_uids'][-10000:]
-                
-                return self._write_json(self.emails_file, data)
-            
+            uid = str(uid)
+            if uid in self._uid_set:
+                return True
+
+            self._remember_uid(uid)
+            self._pending_uids.append(uid)
             return True
-            
+
         except Exception as e:
             self.logger.error(f"Error al guardar UID procesado: {e}")
             return False
-    
-    def get_processed_uids(self) -> Set[str]:
+
+    def save_processed_uids(self, uids) -> bool:
+        """
+        Guarda un lote de UIDs procesados en una sola escritura.
+
+        Args:
+            uids: Iterable de UIDs a guardar
+
+        Returns:
+            True si fue exitoso
+        """
+        try:
+            new_uids = [uid for uid in map(str, uids) if uid not in self._uid_set]
+            if not new_uids:
+                return True
+
+            for uid in new_uids:
+                self._remember_uid(uid)
+
+            self._pending_uids.extend(new_uids)
+            self.flush()
+            return True
+
+        except Exception as e:
+            self.logger.error(f"Error al guardar UIDs procesados: {e}")
+            return False
+
+    def get_processed_uids(self) -> FrozenSet[str]:
         """
         Obtiene todos los UIDs procesados.
-        
+
         Returns:
-            Set de UIDs procesados
+            Vista inmutable de los UIDs procesados; se cachea entre
+            lecturas y se invalida ante cada mutación
         """
-        data = self._read_json(self.emails_file)
-        return set(data.get('processed_uids', []))
-    
+        if self._uid_frozen is None:
+            self._uid_frozen = frozenset(self._uid_set)
+        return self._uid_frozen
+
     def clear_processed_uids(self) -> bool:
         """
         Elimina todos los UIDs procesados.
-        
+
         Returns:
             True si fue exitoso
         """
-        data = self._read_json(self.emails_file)
-        data['processed_uids'] = []
-        return self._write_json(self.emails_file, data)
+        try:
+            self._uid_set.clear()
+            self._uid_order.clear()
+            self._pending_uids.clear()
+            self._uid_frozen = None
+            self.uids_file.write_text('', encoding='utf-8')
+            return True
+        except Exception as e:
+            self.logger.error(f"Error al limpiar UIDs procesados: {e}")
+            return False
     
     # Gestión de actividades programadas
-    
+
+    def _write_schedule(self) -> bool:
+        """Persiste la lista de actividades en schedule.json."""
+        return self._write_json(self.schedule_file, {
+            "activities": self._activities
+        })
+
     def save_activity(self, activity: Dict[str, Any]) -> bool:
         """
         Guarda una actividad programada.
-        
+
         Args:
             activity: Datos de la actividad
-            
+
         Returns:
             True si fue exitoso
         """
         try:
-            data = self._read_json(self.schedule_file)
-            
             # Agregar timestamp si no existe
             if 'created_at' not in activity:
                 activity['created_at'] = datetime.now().isoformat()
-            
-            data['activities'].append(activity)
-            
-            success = self._write_json(self.schedule_file, data)
+
+            self._activities.append(activity)
+            self._activity_index[activity.get('id')] = len(self._activities) - 1
+
+            success = self._write_schedule()
             if success:
-                self.logger.debug(f"Actividad guardada: {activity.get('title', 'Sin título')}")
-            
+                self.logger.debug("Actividad guardada: %s", activity.get('title', 'Sin título'))
+
             return success
-            
+
         except Exception as e:
             self.logger.error(f"Error al guardar actividad: {e}")
             return False
-    
+
     def get_activities(self) -> List[Dict[str, Any]]:
         """
         Obtiene todas las actividades programadas.
-        
+
         Returns:
             Lista de actividades
         """
-        data = self._read_json(self.schedule_file)
-        return data.get('activities', [])
-    
+        return list(self._activities)
+
     def update_activity(self, activity_id: str, updated_data: Dict[str, Any]) -> bool:
         """
         Actualiza una actividad existente.
-        
+
         Args:
             activity_id: ID de la actividad
             updated_data: Datos actualizados
-            
+
         Returns:
             True si fue exitoso
         """
         try:
-            data = self._read_json(self.schedule_file)
-            activities = data.get('activities', [])
-            
-            for i, activity in enumerate(activities):
-                if activity.get('id') == activity_id:
-                    activities[i].update(updated_data)
-                    activities[i]['updated_at'] = datetime.now().isoformat()
-                    data['activities'] = activities
-                    return self._write_json(self.schedule_file, data)
-            
-            self.logger.warning(f"Actividad no encontrada: {activity_id}")
-            return False
-            
+            idx = self._activity_index.get(activity_id)
+            if idx is None:
+                self.logger.warning(f"Actividad no encontrada: {activity_id}")
+                return False
+
+            self._activities[idx].update(updated_data)
+            self._activities[idx]['updated_at'] = datetime.now().isoformat()
+            return self._write_schedule()
+
         except Exception as e:
             self.logger.error(f"Error al actualizar actividad: {e}")
             return False
-    
+
     def delete_activity(self, activity_id: str) -> bool:
         """
         Elimina una actividad.
-        
+
         Args:
             activity_id: ID de la actividad a eliminar
-            
+
         Returns:
             True si fue exitoso
         """
         try:
-            data = self._read_json(self.schedule_file)
-            activities = data.get('activities', [])
-            
-            initial_length = len(activities)
-            activities = [a for a in activities if a.get('id') != activity_id]
-            
-            if len(activities) < initial_length:
-                data['activities'] = activities
-                return self._write_json(self.schedule_file, data)
-            
-            self.logger.warning(f"Actividad no encontrada: {activity_id}")
-            return False
-            
+            idx = self._activity_index.pop(activity_id, None)
+            if idx is None:
+                self.logger.warning(f"Actividad no encontrada: {activity_id}")
+                return False
+
+            self._activities.pop(idx)
+            # Reindexar solo las entradas posteriores a la eliminada
+            for i in range(idx, len(self._activities)):
+                self._activity_index[self._activities[i].get('id')] = i
+
+            return self._write_schedule()
+
         except Exception as e:
             self.logger.error(f"Error al eliminar actividad: {e}")
             return False
-    
+
     def clear_activities(self) -> bool:
         """
         Elimina todas las actividades.
-        
+
         Returns:
             True si fue exitoso
         """
-        data = self._read_json(self.schedule_file)
-        data['activities'] = []
-        return self._write_json(self.schedule_file, data)
+        self._activities.clear()
+        self._activity_index.clear()
+        return self._write_schedule()
 
 
 # Instancia global
@@ -0,0 +1,337 @@
+"""
+Servidor IMAP de prueba para desarrollo local.
+Sirve un buzón fijo en memoria para ejercitar el monitor de email
+sin depender de una cuenta IMAP real.
+"""
+
+import asyncio
+import logging
+import socket
+import threading
+from typing import Any, Dict, List, Optional
+
+# Buzón de prueba: mensajes inmutables servidos a todos los clientes
+TEST_EMAILS: List[Dict[str, Any]] = [
+    {
+        'from': 'soporte@example.com',
+        'to': 'alertas@example.com',
+        'subject': 'Alerta de prueba 1',
+        'date': 'Mon, 01 Jan 2024 10:00:00 +0000',
+        'body': 'Primer mensaje del buzón de prueba.',
+    },
+    {
+        'from': 'monitoreo@example.com',
+        'to': 'alertas@example.com',
+        'subject': 'Alerta de prueba 2',
+        'date': 'Mon, 01 Jan 2024 11:30:00 +0000',
+        'body': 'Segundo mensaje, con acentos: configuración, señal.',
+    },
+    {
+        'from': 'sistema@example.com',
+        'to': 'alertas@example.com',
+        'subject': 'Alerta de prueba 3',
+        'date': 'Mon, 01 Jan 2024 13:45:00 +0000',
+        'body': 'Tercer mensaje para probar el listado completo.',
+    },
+]
+
+# Plantillas de respuesta precompiladas (bytes, no hay encode por comando)
+_GREETING = b'* OK Servidor IMAP de prueba listo\r\n'
+_CAPABILITY_LINE = b'* CAPABILITY IMAP4rev1\r\n'
+_UIDVALIDITY_LINE = b'* OK [UIDVALIDITY 1] UIDs valid\r\n'
+_BYE_LINE = b'* BYE Cerrando conexion\r\n'
+
+
+class _ClientState:
+    """Estado mínimo por conexión IMAP."""
+
+    __slots__ = ('logged_in', 'selected')
+
+    def __init__(self):
+        self.logged_in = False
+        self.selected = False
+
+
+class TestIMAPServer:
+    """Servidor IMAP mínimo (plano, sin SSL) para desarrollo."""
+
+    # Segundos sin comandos antes de cerrar una conexión ociosa
+    IDLE_TIMEOUT = 300.0
+
+    # Conexiones simultáneas máximas; las demás se rechazan con BYE
+    MAX_CLIENTS = 256
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 1143,
+                 reuse_port: bool = False):
+        """
+        Inicializa el servidor de prueba.
+
+        Args:
+            host: Dirección donde escuchar
+            port: Puerto donde escuchar
+            reuse_port: Permitir varias instancias en el mismo puerto
+                (SO_REUSEPORT, el kernel balancea las conexiones entre ellas)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.host = host
+        self.port = port
+        self.reuse_port = reuse_port
+        self.test_emails = TEST_EMAILS
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop_event: Optional[asyncio.Event] = None
+
+        # Los mensajes son inmutables: precomputar una vez los bytes de
+        # cada respuesta FETCH y la línea SEARCH, así el camino caliente
+        # es un solo sendall de bytes ya armados (sin f-strings ni encode)
+        self._rfc822_cache: List[bytes] = [
+            self._build_rfc822(e).encode('utf-8') for e in self.test_emails
+        ]
+        self._fetch_body_bytes: List[bytes] = [
+            f'* {i + 1} FETCH (UID {i + 1} RFC822 {{{len(body)}}}\r\n'.encode('ascii')
+            + body + b')\r\n'
+            for i, body in enumerate(self._rfc822_cache)
+        ]
+        uids = ' '.join(str(i + 1) for i in range(len(self.test_emails)))
+        self._search_line = f'* SEARCH {uids}\r\n'.encode('ascii')
+        self._exists_line = f'* {len(self.test_emails)} EXISTS\r\n'.encode('ascii')
+
+        # Despacho O(1) por comando (bytes ya en mayúsculas), en lugar
+        # de la cadena de if/elif con comparaciones de strings
+        self._dispatch = {
+            b'CAPABILITY': self._cmd_capability,
+            b'LOGIN': self._cmd_login,
+            b'SELECT': self._cmd_select,
+            b'EXAMINE': self._cmd_select,
+            b'SEARCH': self._cmd_search,
+            b'FETCH': self._cmd_fetch,
+            b'NOOP': self._cmd_noop,
+            b'LOGOUT': self._cmd_logout,
+        }
+
+    def start(self) -> None:
+        """Inicia el servidor en un thread de fondo con su propio loop."""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(
+            target=lambda: asyncio.run(self._run_server()),
+            name='test-imap-server',
+            daemon=True
+        )
+        self._thread.start()
+        self.logger.info(f"Servidor IMAP de prueba en {self.host}:{self.port}")
+
+    def stop(self) -> None:
+        """Detiene el servidor."""
+        self._running = False
+        if self._loop and self._stop_event:
+            self._loop.call_soon_threadsafe(self._stop_event.set)
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.logger.info("Servidor IMAP de prueba detenido")
+
+    async def _run_server(self) -> None:
+        """
+        Reactor asyncio: todas las conexiones se multiplexan en un solo
+        thread, sin thread por cliente ni polling de accept con timeout.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        self._client_sem = asyncio.Semaphore(self.MAX_CLIENTS)
+        try:
+            server = await asyncio.start_server(
+                self._handle_client, self.host, self.port,
+                reuse_address=True, reuse_port=self.reuse_port,
+                backlog=1024
+            )
+        except OSError as e:
+            self.logger.error(f"No se pudo iniciar el servidor IMAP de prueba: {e}")
+            self._running = False
+            return
+
+        async with server:
+            await self._stop_event.wait()
+
+    def _build_rfc822(self, email_data: Dict[str, Any]) -> str:
+        """Arma el mensaje RFC822 plano a partir del dict de prueba."""
+        return (
+            f"From: {email_data['from']}\r\n"
+            f"To: {email_data['to']}\r\n"
+            f"Subject: {email_data['subject']}\r\n"
+            f"Date: {email_data['date']}\r\n"
+            f"Content-Type: text/plain; charset=utf-8\r\n"
+            f"\r\n"
+            f"{email_data['body']}\r\n"
+        )
+
+    async def _handle_client(self, reader: asyncio.StreamReader,
+                             writer: asyncio.StreamWriter) -> None:
+        """Acepta o rechaza la conexión según el cupo de clientes."""
+        # Contrapresión explícita: con el cupo lleno se rechaza con BYE
+        # en lugar de encolar tareas sin límite
+        if self._client_sem.locked():
+            self.logger.warning("Cupo de clientes IMAP lleno, rechazando conexión")
+            try:
+                writer.write(b'* BYE Servidor saturado\r\n')
+                await writer.drain()
+                writer.close()
+                await writer.wait_closed()
+            except OSError:
+                pass
+            return
+        async with self._client_sem:
+            await self._serve_connection(reader, writer)
+
+    async def _serve_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter) -> None:
+        """
+        Atiende una conexión IMAP como corutina.
+
+        Todas las líneas de una respuesta se juntan en una sola escritura:
+        menos cruces de syscall por comando.
+        """
+        # Respuestas cortas: deshabilitar Nagle y agrandar los buffers
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 65536)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 65536)
+            # Keepalive agresivo: pares muertos se detectan en ~90s en
+            # lugar de retener la conexión (y su tarea) para siempre
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            if hasattr(socket, 'TCP_KEEPIDLE'):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 60)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 10)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3)
+
+        self.logger.debug("Cliente IMAP conectado: %s", writer.get_extra_info('peername'))
+        state = _ClientState()
+        try:
+            writer.write(_GREETING)
+            await writer.drain()
+
+            while self._running:
+                # Framing estricto por CRLF: comandos encadenados en un
+                # mismo segmento TCP salen de a uno, y un comando partido
+                # en varios segmentos se acumula hasta estar completo
+                try:
+                    line = await asyncio.wait_for(
+                        reader.readuntil(b'\r\n'), timeout=self.IDLE_TIMEOUT
+                    )
+                except asyncio.TimeoutError:
+                    self.logger.debug("Conexión IMAP inactiva, cerrando")
+                    break
+                except asyncio.IncompleteReadError:
+                    break
+                except asyncio.LimitOverrunError:
+                    self.logger.warning("Línea IMAP demasiado larga, cerrando conexión")
+                    break
+
+                # Parseo directo sobre bytes: sin decode en el camino caliente
+                parts = line.strip().split(None, 2)
+                if not parts:
+                    continue
+                tag = parts[0]
+                command = parts[1].upper() if len(parts) > 1 else b''
+                args = parts[2] if len(parts) > 2 else b''
+
+                # UID SEARCH / UID FETCH: mismo manejo que la variante corta
+                if command == b'UID' and args:
+                    sub = args.split(None, 1)
+                    command = sub[0].upper()
+                    args = sub[1] if len(sub) > 1 else b''
+
+                handler = self._dispatch.get(command)
+                if handler is None:
+                    out = [tag + b' BAD Comando no soportado\r\n']
+                else:
+                    out = handler(tag, args, state)
+
+                # Una sola escritura por comando: la lista de líneas se
+                # entrega entera al transporte (estilo scatter-gather),
+                # sin concatenar los buffers en Python
+                writer.writelines(out)
+                await writer.drain()
+
+                if command == b'LOGOUT':
+                    break
+
+        except (ConnectionResetError, BrokenPipeError, OSError):
+            pass
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.logger.error(f"Error atendiendo cliente IMAP: {e}")
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    # Manejadores de comandos: reciben (tag, args, state) en bytes y
+    # devuelven la lista de líneas de respuesta
+
+    def _cmd_capability(self, tag: bytes, args: bytes, state: '_ClientState') -> List[bytes]:
+        return [_CAPABILITY_LINE, tag + b' OK CAPABILITY completed\r\n']
+
+    def _cmd_login(self, tag: bytes, args: bytes, state: '_ClientState') -> List[bytes]:
+        state.logged_in = True
+        return [tag + b' OK LOGIN completed\r\n']
+
+    def _cmd_select(self, tag: bytes, args: bytes, state: '_ClientState') -> List[bytes]:
+        state.selected = True
+        return [
+            self._exists_line,
+            _UIDVALIDITY_LINE,
+            tag + b' OK [READ-WRITE] SELECT completed\r\n',
+        ]
+
+    def _cmd_search(self, tag: bytes, args: bytes, state: '_ClientState') -> List[bytes]:
+        return [self._search_line, tag + b' OK SEARCH completed\r\n']
+
+    def _cmd_fetch(self, tag: bytes, args: bytes, state: '_ClientState') -> List[bytes]:
+        out = self._fetch_responses(args)
+        out.append(tag + b' OK FETCH completed\r\n')
+        return out
+
+    def _cmd_noop(self, tag: bytes, args: bytes, state: '_ClientState') -> List[bytes]:
+        return [tag + b' OK NOOP completed\r\n']
+
+    def _cmd_logout(self, tag: bytes, args: bytes, state: '_ClientState') -> List[bytes]:
+        return [_BYE_LINE, tag + b' OK LOGOUT completed\r\n']
+
+    def _fetch_responses(self, args: bytes) -> List[bytes]:
+        """
+        Genera las respuestas FETCH para el rango pedido.
+
+        Siempre devuelve el mensaje RFC822 completo, alcanza para el
+        monitor en desarrollo aunque pida secciones parciales.
+        """
+        out: List[bytes] = []
+        requested = args.split(None, 1)[0] if args else b'1'
+        for uid in self._iter_uids(requested):
+            if not 1 <= uid <= len(self.test_emails):
+                continue
+            out.append(self._fetch_body_bytes[uid - 1])
+        return out
+
+    def _iter_uids(self, requested: bytes):
+        """Expande un conjunto de secuencia IMAP simple (n, n:m, a,b)."""
+        for part in requested.split(b','):
+            if b':' in part:
+                lo, _, hi = part.partition(b':')
+                try:
+                    lo_i = int(lo)
+                    hi_i = len(self.test_emails) if hi == b'*' else int(hi)
+                except ValueError:
+                    continue
+                yield from range(lo_i, hi_i + 1)
+            else:
+                try:
+                    yield int(part)
+                except ValueError:
+                    continue
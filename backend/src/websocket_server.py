@@ -7,10 +7,37 @@ import asyncio
 import websockets
 import json
 import logging
-from typing import Set, Dict, Any, Optional
+from typing import Dict, Any, Optional
 from websockets.server import WebSocketServerProtocol
 
 from config_loader import config
+from storage_manager import storage
+from schedule_manager import scheduler
+
+# orjson (C) serializa y parsea varias veces más rápido que json y
+# devuelve bytes directamente; si no está instalado se usa la estándar
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+else:
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+    _loads = json.loads
+
+# Respuestas fijas pre-serializadas: el pong (el mensaje más frecuente
+# con keepalive) sale sin ninguna serialización; la bienvenida solo
+# interpola el contador de clientes sobre una plantilla de bytes
+_PONG = _dumps({'type': 'pong'})
+_WELCOME_TMPL = (
+    b'{"type":"connected","message":"Conectado al servidor de alertas",'
+    b'"clients_connected":%d}'
+)
 
 
 class WebSocketServer:
@@ -19,19 +46,41 @@ class WebSocketServer:
     def __init__(self):
         """Inicializa el servidor WebSocket."""
         self.logger = logging.getLogger(__name__)
-        self.clients: Set[WebSocketServerProtocol] = set()
+        # Lista contigua con tombstones (None) en vez de set: el fan-out
+        # del broadcast la recorre sin copiar ni hashear, y se compacta
+        # cuando los huecos superan el 25%
+        self._clients: list = []
+        self._client_slots: Dict[WebSocketServerProtocol, int] = {}
+        self._client_count = 0
         self.server: Optional[websockets.WebSocketServer] = None
         self._host = config.websocket_host
         self._port = config.websocket_port
         self._running = False
+
+        # Bytes serializados de las listas completas, invalidados ante
+        # cada mutación: los refrescos repetidos no re-serializan nada
+        self._emails_cache: Optional[bytes] = None
+        self._activities_cache: Optional[bytes] = None
+
+        # Loop del servidor, capturado en start(): broadcast_sync lo usa
+        # para despachar desde threads ajenos al loop
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
     
     async def start(self) -> None:
         """Inicia el servidor WebSocket."""
         try:
+            self._loop = asyncio.get_running_loop()
+            # Sin permessage-deflate: este es un bus de notificaciones de
+            # frames chicos, comprimir cada pong/delta gasta CPU sin
+            # ahorrar ancho de banda apreciable
             self.server = await websockets.serve(
                 self._handle_client,
                 self._host,
-                self._port
+                self._port,
+                compression=None,
+                max_size=2 ** 20,
+                ping_interval=20,
+                ping_timeout=20
             )
             self._running = True
             self.logger.info(f"Servidor WebSocket iniciado en ws://{self._host}:{self._port}")
@@ -51,9 +100,9 @@ class WebSocketServer:
         self._running = False
         
         # Cerrar todas las conexiones de clientes
-        if self.clients:
+        if self._client_count:
             await asyncio.gather(
-                *[client.close() for client in self.clients],
+                *[client.close() for client in self._clients if client is not None],
                 return_exceptions=True
             )
         
@@ -64,6 +113,26 @@ class WebSocketServer:
         
         self.logger.info("Servidor WebSocket detenido")
     
+    def _register_client(self, websocket: WebSocketServerProtocol) -> None:
+        """Agrega un cliente a la lista de fan-out."""
+        self._client_slots[websocket] = len(self._clients)
+        self._clients.append(websocket)
+        self._client_count += 1
+
+    def _unregister_client(self, websocket: WebSocketServerProtocol) -> None:
+        """Marca el slot del cliente como tombstone y compacta si hace falta."""
+        slot = self._client_slots.pop(websocket, None)
+        if slot is None:
+            return
+        self._clients[slot] = None
+        self._client_count -= 1
+
+        # Compactar cuando más del 25% de la lista son huecos
+        holes = len(self._clients) - self._client_count
+        if holes > 4 and holes * 4 > len(self._clients):
+            self._clients = [c for c in self._clients if c is not None]
+            self._client_slots = {c: i for i, c in enumerate(self._clients)}
+
     async def _handle_client(self, websocket: WebSocketServerProtocol, path: str) -> None:
         """
         Maneja la conexión de un cliente WebSocket.
@@ -73,17 +142,13 @@ class WebSocketServer:
             path: Ruta de la conexión
         """
         # Registrar cliente
-        self.clients.add(websocket)
+        self._register_client(websocket)
         client_addr = websocket.remote_address
-        self.logger.info(f"Cliente conectado: {client_addr} (Total: {len(self.clients)})")
+        self.logger.info(f"Cliente conectado: {client_addr} (Total: {self._client_count})")
         
         try:
             # Enviar mensaje de bienvenida
-            await self._send_to_client(websocket, {
-                'type': 'connected',
-                'message': 'Conectado al servidor de alertas',
-                'clients_connected': len(self.clients)
-            })
+            await websocket.send(_WELCOME_TMPL % self._client_count)
             
             # Mantener la conexión abierta y escuchar mensajes
             async for message in websocket:
@@ -95,8 +160,8 @@ class WebSocketServer:
             self.logger.error(f"Error manejando cliente {client_addr}: {e}")
         finally:
             # Desregistrar cliente
-            self.clients.discard(websocket)
-            self.logger.info(f"Cliente removido: {client_addr} (Total: {len(self.clients)})")
+            self._unregister_client(websocket)
+            self.logger.info(f"Cliente removido: {client_addr} (Total: {self._client_count})")
     
     async def _handle_message(self, websocket: WebSocketServerProtocol, message: str) -> None:
         """
@@ -107,20 +172,20 @@ class WebSocketServer:
             message: Mensaje recibido
         """
         try:
-            data = json.loads(message)
+            data = _loads(message)
             msg_type = data.get('type', 'unknown')
             msg_data = data.get('data', {})
             
-            self.logger.debug(f"Mensaje recibido de {websocket.remote_address}: {msg_type}")
+            self.logger.debug("Mensaje recibido de %s: %s", websocket.remote_address, msg_type)
             
             # Procesar según el tipo de mensaje
             if msg_type == 'ping':
-                await self._send_to_client(websocket, {'type': 'pong'})
+                await websocket.send(_PONG)
             
             elif msg_type == 'status':
                 await self._send_to_client(websocket, {
                     'type': 'status_response',
-                    'clients_connected': len(self.clients),
+                    'clients_connected': self._client_count,
                     'server_running': self._running
                 })
             
@@ -152,7 +217,7 @@ class WebSocketServer:
                     'message': f'Tipo de mensaje desconocido: {msg_type}'
                 })
                 
-        except json.JSONDecodeError:
+        except ValueError:
             self.logger.warning(f"Mensaje no JSON recibido: {message[:100]}")
         except Exception as e:
             self.logger.error(f"Error procesando mensaje: {e}")
@@ -173,8 +238,7 @@ class WebSocketServer:
             True si fue exitoso
         """
         try:
-            message = json.dumps(data, ensure_ascii=False)
-            await websocket.send(message)
+            await websocket.send(_dumps(data))
             return True
         except Exception as e:
             self.logger.error(f"Error enviando mensaje a cliente: {e}")
@@ -182,30 +246,26 @@ class WebSocketServer:
     
     async def _handle_get_emails(self, websocket: WebSocketServerProtocol) -> None:
         """Envía la lista de correos al cliente."""
-        from storage_manager import storage
-        
-        emails = storage.get_all_emails()
-        await self._send_to_client(websocket, {
-            'type': 'email_list',
-            'data': {'emails': emails}
-        })
-        self.logger.info(f"Enviados {len(emails)} correos al cliente")
+        if self._emails_cache is None:
+            self._emails_cache = _dumps({
+                'type': 'email_list',
+                'data': {'emails': storage.get_all_emails()}
+            })
+        await websocket.send(self._emails_cache)
+        self.logger.info("Lista de correos enviada al cliente")
     
     async def _handle_get_activities(self, websocket: WebSocketServerProtocol) -> None:
         """Envía la lista de actividades al cliente."""
-        from schedule_manager import scheduler
-        
-        activities = scheduler.get_all_activities()
-        await self._send_to_client(websocket, {
-            'type': 'activities_list',
-            'data': {'activities': activities}
-        })
-        self.logger.info(f"Enviadas {len(activities)} actividades al cliente")
+        if self._activities_cache is None:
+            self._activities_cache = _dumps({
+                'type': 'activities_list',
+                'data': {'activities': scheduler.get_all_activities()}
+            })
+        await websocket.send(self._activities_cache)
+        self.logger.info("Lista de actividades enviada al cliente")
     
     async def _handle_get_config(self, websocket: WebSocketServerProtocol) -> None:
         """Envía la configuración actual al cliente."""
-        from config_loader import config
-        
         config_data = {
             'email': {
                 'server': config.email_server,
@@ -235,8 +295,6 @@ class WebSocketServer:
     
     async def _handle_mark_read(self, websocket: WebSocketServerProtocol, data: Dict[str, Any]) -> None:
         """Marca un correo como leído."""
-        from storage_manager import storage
-        
         email_id = data.get('email_id')
         if not email_id:
             await self._send_to_client(websocket, {
@@ -245,24 +303,11 @@ class WebSocketServer:
             })
             return
         
-        # Leer datos actuales
-        emails_data = storage._read_json(storage.emails_file)
-        emails = emails_data.get('emails', [])
-        
-        # Actualizar el correo
-        updated = False
-        for email in emails:
-            if email.get('id') == email_id:
-                email['unread'] = False
-                updated = True
-                break
-        
-        if updated:
-            # Guardar cambios
-            emails_data['emails'] = emails
-            storage._write_json(storage.emails_file, emails_data)
-            
-            await self._send_to_client(websocket, {
+        if storage.mark_email_read(email_id):
+            self._emails_cache = None
+            # Broadcast del delta: los demás clientes aplican el cambio
+            # localmente sin re-pedir la lista completa de correos
+            await self.broadcast({
                 'type': 'email_marked_read',
                 'data': {'email_id': email_id}
             })
@@ -275,8 +320,6 @@ class WebSocketServer:
     
     async def _handle_add_activity(self, websocket: WebSocketServerProtocol, data: Dict[str, Any]) -> None:
         """Agrega una nueva actividad."""
-        from schedule_manager import scheduler
-        
         title = data.get('title')
         description = data.get('description', '')
         scheduled_date = data.get('scheduled_date')
@@ -289,7 +332,8 @@ class WebSocketServer:
             return
         
         try:
-            activity = scheduler.add_activity(title, description, scheduled_date)
+            activity = await scheduler.add_activity(title, description, scheduled_date)
+            self._activities_cache = None
             
             # Notificar al cliente que lo agregó
             await self._send_to_client(websocket, {
@@ -312,8 +356,6 @@ class WebSocketServer:
     
     async def _handle_delete_activity(self, websocket: WebSocketServerProtocol, data: Dict[str, Any]) -> None:
         """Elimina una actividad."""
-        from schedule_manager import scheduler
-        
         activity_id = data.get('activity_id')
         if not activity_id:
             await self._send_to_client(websocket, {
@@ -323,7 +365,8 @@ class WebSocketServer:
             return
         
         try:
-            scheduler.remove_activity(activity_id)
+            await scheduler.remove_activity(activity_id)
+            self._activities_cache = None
             
             # Notificar al cliente que lo eliminó
             await self._send_to_client(websocket, {
@@ -346,8 +389,6 @@ class WebSocketServer:
     
     async def _handle_update_config(self, websocket: WebSocketServerProtocol, data: Dict[str, Any]) -> None:
         """Actualiza la configuración."""
-        from config_loader import config
-        
         try:
             # Actualizar configuración de email si está presente
             if 'email' in data:
@@ -400,30 +441,30 @@ class WebSocketServer:
         Returns:
             Número de clientes que recibieron el mensaje
         """
-        if not self.clients:
+        if not self._client_count:
             self.logger.debug("No hay clientes conectados para broadcast")
             return 0
-        
-        message = json.dumps(data, ensure_ascii=False)
+
+        # Serializar y codificar una sola vez; los envíos salen en
+        # paralelo en vez de encolarse uno a uno en la misma corutina
+        payload = _dumps(data)
+        recipients = [c for c in self._clients if c is not None]
+        results = await asyncio.gather(
+            *(client.send(payload) for client in recipients),
+            return_exceptions=True
+        )
+
         success_count = 0
-        failed_clients = []
-        
-        # Enviar a todos los clientes
-        for client in self.clients.copy():
-            try:
-                await client.send(message)
+        for client, result in zip(recipients, results):
+            if result is None:
                 success_count += 1
-            except websockets.exceptions.ConnectionClosed:
-                failed_clients.append(client)
-            except Exception as e:
-                self.logger.error(f"Error en broadcast a {client.remote_address}: {e}")
-                failed_clients.append(client)
-        
-        # Limpiar clientes fallidos
-        for client in failed_clients:
-            self.clients.discard(client)
-        
-        self.logger.info(f"Broadcast enviado a {success_count}/{len(self.clients) + len(failed_clients)} clientes")
+            elif isinstance(result, websockets.exceptions.ConnectionClosed):
+                self._unregister_client(client)
+            else:
+                self.logger.error(f"Error en broadcast a {client.remote_address}: {result}")
+                self._unregister_client(client)
+
+        self.logger.info(f"Broadcast enviado a {success_count}/{len(recipients)} clientes")
         return success_count
     
     def broadcast_sync(self, data: Dict[str, Any]) -> None:
@@ -433,22 +474,16 @@ class WebSocketServer:
         Args:
             data: Datos a transmitir
         """
+        if self._loop is None:
+            self.logger.warning("broadcast_sync antes de start(): mensaje descartado")
+            return
+
         try:
-            # Obtener el event loop actual o crear uno nuevo
-            try:
-                loop = asyncio.get_event_loop()
-                if loop.is_running():
-                    # Si el loop está corriendo, usar run_coroutine_threadsafe
-                    asyncio.run_coroutine_threadsafe(self.broadcast(data), loop)
-                else:
-                    # Si no está corriendo, ejecutar directamente
-                    loop.run_until_complete(self.broadcast(data))
-            except RuntimeError:
-                # No hay event loop, crear tarea para el loop principal
-                asyncio.create_task(self.broadcast(data))
-                
-        except Exception as e:
-            self.logger.error(f"Error en broadcast_sync: {e}")
+            # Siempre sobre el loop del servidor: get_event_loop() desde
+            # otro thread crearía un loop nuevo que nadie ejecuta
+            asyncio.run_coroutine_threadsafe(self.broadcast(data), self._loop)
+        except RuntimeError as e:
+            self.logger.error(f"Error en broadcast_sync (loop cerrado): {e}")
     
     def broadcast_new_email(self, email_data: Dict[str, Any]) -> None:
         """
@@ -458,6 +493,7 @@ class WebSocketServer:
         Args:
             email_data: Datos del email
         """
+        self._emails_cache = None
         message = {
             'type': 'new_email',
             'data': email_data,
@@ -474,7 +510,7 @@ class WebSocketServer:
     @property
     def connected_clients(self) -> int:
         """Número de clientes conectados."""
-        return len(self.clients)
+        return self._client_count
     
     def get_stats(self) -> Dict[str, Any]:
         """Obtiene estadísticas del servidor."""
@@ -482,5 +518,5 @@ class WebSocketServer:
             'running': self._running,
             'host': self._host,
             'port': self._port,
-            'connected_clients': len(self.clients)
+            'connected_clients': self._client_count
         }
@@ -113,6 +113,16 @@ class AlertApp {
             this.showNotification('Actividad eliminada correctamente', 'success');
         });
 
+        // Correo marcado como leído (por este u otro cliente)
+        window.addEventListener('ws:email_marked_read', (event) => {
+            const email = this.emails.find(e => e.id === event.detail.email_id);
+            if (email && email.unread) {
+                email.unread = false;
+                this.renderEmails();
+                this.updateStats();
+            }
+        });
+
         // Confirmación de configuración actualizada
         window.addEventListener('ws:config_updated', (event) => {
             console.log('[App] Configuración actualizada:', event.detail);
@@ -23,7 +23,9 @@ class WebSocketClient {
 
         try {
             this.ws = new WebSocket(this.url);
-            
+            // El servidor emite frames binarios (UTF-8 pre-codificado)
+            this.ws.binaryType = 'arraybuffer';
+
             this.ws.onopen = () => this.handleOpen();
             this.ws.onmessage = (event) => this.handleMessage(event);
             this.ws.onerror = (error) => this.handleError(error);
@@ -54,7 +56,10 @@ class WebSocketClient {
 
     handleMessage(event) {
         try {
-            const message = JSON.parse(event.data);
+            const raw = typeof event.data === 'string'
+                ? event.data
+                : new TextDecoder().decode(event.data);
+            const message = JSON.parse(raw);
             console.log('[WebSocket] Mensaje recibido:', message);
 
             // Disparar evento específico según el tipo de mensaje
@@ -0,0 +1,22 @@
+#!/bin/bash
+# Script para generar variantes precomprimidas (.gz y .br) de los
+# archivos estáticos. El servidor HTTP las sirve directamente según el
+# Accept-Encoding del navegador, sin comprimir en cada request.
+
+set -e
+
+STATIC_DIR="$(dirname "$0")/../backend/static"
+
+echo "Comprimiendo archivos estáticos en $STATIC_DIR..."
+
+find "$STATIC_DIR" \( -name "*.css" -o -name "*.js" -o -name "*.html" \) | while read -r file; do
+    gzip -9 -k -f "$file"
+    echo "  ✓ ${file}.gz"
+
+    if command -v brotli > /dev/null; then
+        brotli -f -k "$file"
+        echo "  ✓ ${file}.br"
+    fi
+done
+
+echo "✓ Archivos estáticos comprimidos"